@@ -0,0 +1,165 @@
+"""
+ICMP-Batch-Pinger für Network Monitor.
+Sendet Echo-Requests an alle Hosts auf einmal und sammelt die Antworten
+über eine einzige select()-Schleife ein.
+"""
+
+import logging
+import math
+import os
+import select
+import socket
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from monitor import ping_host, resolve_addr
+
+logger = logging.getLogger(__name__)
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+_PAYLOAD = b"network-monitor"
+
+# Parallele ping-Subprozesse im Fallback ohne ICMP-Socket
+MAX_PING_WORKERS = 32
+
+
+def _checksum(data: bytes) -> int:
+    """Internet-Prüfsumme (RFC 1071) über ``data``."""
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(ident: int, seq: int, payload: bytes = _PAYLOAD) -> bytes:
+    """Erzeugt ein ICMP-Echo-Request-Paket inkl. Prüfsumme."""
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    csum = _checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, csum, ident, seq) + payload
+
+
+def _open_icmp_socket() -> tuple[socket.socket, bool]:
+    """
+    Öffnet einen ICMP-Socket.
+
+    Bevorzugt wird der unprivilegierte Linux-Ping-Socket (``SOCK_DGRAM``),
+    als Root ersatzweise ein Raw-Socket.
+
+    Returns
+    -------
+    tuple[socket.socket, bool]
+        (Socket, True wenn Raw-Socket mit IP-Header in den Antworten)
+    """
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP), False
+    except OSError:
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP), True
+
+
+def _ping_many_subprocess(hosts: list[str], timeout: float) -> dict[str, tuple[bool, Optional[float]]]:
+    """Fallback ohne ICMP-Socket: System-``ping`` parallel je Host."""
+    seconds = max(1, math.ceil(timeout))
+    with ThreadPoolExecutor(max_workers=min(MAX_PING_WORKERS, len(hosts))) as ex:
+        return dict(zip(hosts, ex.map(lambda h: ping_host(h, seconds), hosts)))
+
+
+def ping_many(hosts: list[str], timeout: float = 1.0) -> dict[str, tuple[bool, Optional[float]]]:
+    """
+    Pingt alle Hosts gleichzeitig über einen einzigen ICMP-Socket.
+
+    Alle Echo-Requests werden vorab gesendet, danach werden die Antworten bis
+    zum gemeinsamen Timeout eingesammelt und über die Sequenznummer und die
+    Absenderadresse zugeordnet. Die Gesamtdauer entspricht damit etwa einem
+    RTT-Fenster statt ``len(hosts)`` Subprozessen. Stehen keine ICMP-Sockets
+    zur Verfügung (fehlende Rechte), wird auf :func:`monitor.ping_host`
+    zurückgefallen – ebenso für einzelne Hosts, die sich nicht über den
+    IPv4-Socket anpingen lassen (IPv6-Adressen, nicht auflösbare Namen,
+    Sendefehler).
+
+    Parameters
+    ----------
+    hosts : list[str]
+        Hostnamen oder IP-Adressen.
+    timeout : float
+        Gemeinsamer Timeout in Sekunden.
+
+    Returns
+    -------
+    dict[str, tuple[bool, Optional[float]]]
+        Je Host (erreichbar, Latenz in ms oder None).
+    """
+    hosts = list(dict.fromkeys(hosts))
+    results: dict[str, tuple[bool, Optional[float]]] = {h: (False, None) for h in hosts}
+    if not hosts:
+        return results
+
+    try:
+        sock, raw = _open_icmp_socket()
+    except OSError as e:
+        logger.info("ICMP-Socket nicht verfügbar (%s) – Fallback auf System-ping", e)
+        return _ping_many_subprocess(hosts, timeout)
+
+    ident = os.getpid() & 0xFFFF
+    pending: dict[int, tuple[str, str, float]] = {}
+    fallback: list[str] = []
+
+    with sock, ThreadPoolExecutor(max_workers=MAX_PING_WORKERS) as ex:
+        sock.setblocking(False)
+        for seq, host in enumerate(hosts, start=1):
+            seq &= 0xFFFF
+            try:
+                family, ip = resolve_addr(host)
+                if family != socket.AF_INET:
+                    fallback.append(host)
+                    continue
+                packet = build_echo_request(ident, seq)
+                sent = time.perf_counter()
+                sock.sendto(packet, (ip, 0))
+            except OSError as e:
+                logger.debug("Echo-Request an %s fehlgeschlagen: %s – System-ping", host, e)
+                fallback.append(host)
+                continue
+            pending[seq] = (host, ip, sent)
+
+        # System-ping läuft parallel zum Einsammeln der ICMP-Antworten
+        seconds = max(1, math.ceil(timeout))
+        fallback_futures = {h: ex.submit(ping_host, h, seconds) for h in fallback}
+
+        deadline = time.perf_counter() + timeout
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            ready, _, _ = select.select([sock], [], [], remaining)
+            if not ready:
+                break
+            try:
+                data, (addr, _) = sock.recvfrom(1024)
+            except OSError:
+                continue
+            received = time.perf_counter()
+
+            if raw:
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8:
+                continue
+            icmp_type, _, _, reply_ident, seq = struct.unpack("!BBHHH", data[:8])
+            # Beim DGRAM-Socket setzt der Kernel die ID selbst und filtert
+            # fremde Antworten – nur beim Raw-Socket muss sie geprüft werden.
+            if icmp_type != ICMP_ECHO_REPLY or (raw and reply_ident != ident):
+                continue
+            entry = pending.get(seq)
+            if entry is None or entry[1] != addr:
+                continue
+            host, _, sent = pending.pop(seq)
+            results[host] = (True, round((received - sent) * 1000, 2))
+
+        for host, future in fallback_futures.items():
+            results[host] = future.result()
+
+    return results
@@ -10,14 +10,14 @@ Verwendung:
 """
 
 import argparse
+import asyncio
 import logging
 import time
 from pathlib import Path
 
-import yaml
-
-from monitor import check_device
-from reporter import save_json_log, save_html_report
+from icmp import ping_many
+from monitor import check_device, check_devices_async, count_statuses
+from reporter import save_json_log, save_html_report, save_to_store
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,6 +28,9 @@ logger = logging.getLogger(__name__)
 
 def load_config(path: Path) -> dict:
     """Laedt die YAML-Konfigurationsdatei."""
+    # Erst hier importiert: der --host-Modus braucht keine Konfiguration
+    import yaml
+
     with open(path, "r", encoding="utf-8") as f:
         return yaml.safe_load(f)
 
@@ -39,26 +42,22 @@ def run_scan(devices: list[dict]) -> None:
     logger.info("  Geraete: %d", len(devices))
     logger.info("=" * 55)
 
-    results = []
-    for device in devices:
-        result = check_device(
-            host=device["host"],
-            ports=device.get("ports", [22, 80, 443])
-        )
-        results.append(result)
+    # Alle Hosts in einem Durchgang pingen, danach nur noch Port-Checks
+    pings = ping_many([d["host"] for d in devices])
+    results = asyncio.run(check_devices_async(devices, pings))
 
-    json_path = save_json_log(results)
-    html_path = save_html_report(results)
-
-    online   = sum(1 for r in results if r.status == "ONLINE")
-    offline  = sum(1 for r in results if r.status == "OFFLINE")
-    degraded = sum(1 for r in results if r.status == "DEGRADED")
+    counts    = count_statuses(results)
+    json_path = save_json_log(results, counts=counts)
+    html_path = save_html_report(results, counts=counts)
+    db_path   = save_to_store(results)
 
     logger.info("-" * 55)
     logger.info("  Scan abgeschlossen")
-    logger.info("  ONLINE: %d | DEGRADED: %d | OFFLINE: %d", online, degraded, offline)
+    logger.info("  ONLINE: %d | DEGRADED: %d | OFFLINE: %d",
+                counts["ONLINE"], counts["DEGRADED"], counts["OFFLINE"])
     logger.info("  JSON : %s", json_path)
     logger.info("  HTML : %s", html_path)
+    logger.info("  DB   : %s", db_path)
     logger.info("=" * 55)
 
 
@@ -71,12 +70,17 @@ def main() -> None:
     parser.add_argument("--config",   type=str,            default="config.yaml")
     args = parser.parse_args()
 
+    # matplotlib/seaborn/pandas nur laden, wenn Plots gewuenscht sind - und dann genau einmal
+    generate_all_plots = None
+    if not args.no_plots:
+        from visualizer import generate_all_plots
+
     if args.host:
         result = check_device(args.host, args.ports)
         save_json_log([result])
         save_html_report([result])
-        if not args.no_plots:
-            from visualizer import generate_all_plots
+        save_to_store([result])
+        if generate_all_plots is not None:
             generate_all_plots()
         return
 
@@ -88,14 +92,12 @@ def main() -> None:
         logger.info("Dauerschleife aktiv - Intervall: %d Sekunden (Ctrl+C zum Stoppen)", interval)
         while True:
             run_scan(devices)
-            if not args.no_plots:
-                from visualizer import generate_all_plots
+            if generate_all_plots is not None:
                 generate_all_plots()
             time.sleep(interval)
     else:
         run_scan(devices)
-        if not args.no_plots:
-            from visualizer import generate_all_plots
+        if generate_all_plots is not None:
             generate_all_plots()
 
 
@@ -3,10 +3,16 @@ Network Monitor – Kernmodul
 Prüft Erreichbarkeit (ICMP) und Port-Status von Netzwerkgeräten.
 """
 
+import asyncio
+import errno
+import selectors
 import subprocess
 import socket
 import logging
 import platform
+import re
+import time
+from collections import Counter
 from datetime import datetime
 from dataclasses import dataclass, field
 from typing import Optional
@@ -17,8 +23,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Plattformabhängige ping-Parameter – einmalig beim Import bestimmt
+_IS_WINDOWS = platform.system().lower() == "windows"
+_PING_COUNT_FLAG = "-n" if _IS_WINDOWS else "-c"
+_PING_TIMEOUT_FLAG = "-w" if _IS_WINDOWS else "-W"
 
-@dataclass
+# RTT aus der ping-Ausgabe: "time=0.045 ms" (Linux/macOS), "time<1ms" / "Zeit=12ms" (Windows)
+_RTT_RE = re.compile(rb"(?:time|Zeit)[=<]\s*([\d.,]+)\s*ms")
+
+# DNS-Cache: Hostname -> (Adressfamilie, IP, Ablaufzeit); Einträge gelten DNS_TTL_SECONDS
+DNS_TTL_SECONDS = 300
+DNS_CACHE_SIZE = 1024
+_DNS_CACHE: dict[str, tuple[int, str, float]] = {}
+
+
+@dataclass(slots=True)
 class CheckResult:
     """Ergebnis einer einzelnen Geräteprüfung."""
     host: str
@@ -27,14 +46,21 @@ class CheckResult:
     ping_latency_ms: Optional[float]
     open_ports: list[int] = field(default_factory=list)
     closed_ports: list[int] = field(default_factory=list)
+    # Wird einmalig beim Erstellen bestimmt statt bei jedem Zugriff
+    status: str = field(init=False)
 
-    @property
-    def status(self) -> str:
+    def __post_init__(self) -> None:
         if not self.ping_ok:
-            return "OFFLINE"
-        if self.closed_ports:
-            return "DEGRADED"
-        return "ONLINE"
+            self.status = "OFFLINE"
+        elif self.closed_ports:
+            self.status = "DEGRADED"
+        else:
+            self.status = "ONLINE"
+
+
+def count_statuses(results: list[CheckResult]) -> Counter:
+    """Zählt ONLINE / DEGRADED / OFFLINE in einem Durchlauf (fehlende Status = 0)."""
+    return Counter(r.status for r in results)
 
 
 def ping_host(host: str, timeout: int = 1) -> tuple[bool, Optional[float]]:
@@ -52,28 +78,100 @@ def ping_host(host: str, timeout: int = 1) -> tuple[bool, Optional[float]]:
     -------
     tuple[bool, Optional[float]]
         (erreichbar, Latenz in ms oder None)
-    """
-    param = "-n" if platform.system().lower() == "windows" else "-c"
-    timeout_param = "-w" if platform.system().lower() == "windows" else "-W"
 
-    cmd = ["ping", param, "1", timeout_param, str(timeout), host]
+    Notes
+    -----
+    Die Latenz ist die von ``ping`` gemeldete Round-Trip-Time. Nur wenn die
+    Ausgabe keine RTT enthält, wird die Laufzeit des Subprozesses verwendet.
+    """
+    cmd = ["ping", _PING_COUNT_FLAG, "1", _PING_TIMEOUT_FLAG, str(timeout), host]
 
     try:
-        start = datetime.now()
+        start = time.perf_counter()
         result = subprocess.run(
             cmd,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             timeout=timeout + 1
         )
-        latency = (datetime.now() - start).total_seconds() * 1000
-        if result.returncode == 0:
-            return True, round(latency, 2)
-        return False, None
+        elapsed = (time.perf_counter() - start) * 1000
+        if result.returncode != 0:
+            return False, None
+        match = _RTT_RE.search(result.stdout)
+        latency = float(match.group(1).replace(b",", b".")) if match else elapsed
+        return True, round(latency, 2)
     except (subprocess.TimeoutExpired, FileNotFoundError):
         return False, None
 
 
+def resolve_addr(host: str) -> tuple[int, str]:
+    """
+    Löst einen Hostnamen in Adressfamilie und IP-Adresse (IPv4 oder IPv6) auf.
+
+    IP-Literale werden per ``AI_NUMERICHOST`` ohne Resolver-Anfrage
+    übernommen; Hostnamen werden für ``DNS_TTL_SECONDS`` zwischengespeichert,
+    sodass Ping und alle Port-Checks eines Geräts mit einem Lookup auskommen.
+    Bei mehreren Adressen gilt die erste in der Reihenfolge von
+    ``getaddrinfo``.
+
+    Parameters
+    ----------
+    host : str
+        Hostname oder IP-Adresse.
+
+    Returns
+    -------
+    tuple[int, str]
+        (``socket.AF_INET`` oder ``socket.AF_INET6``, IP-Adresse)
+
+    Raises
+    ------
+    OSError
+        Wenn der Name nicht aufgelöst werden kann.
+    """
+    try:
+        info = socket.getaddrinfo(
+            host, None, socket.AF_UNSPEC, socket.SOCK_STREAM, 0, socket.AI_NUMERICHOST
+        )
+        return info[0][0], info[0][4][0]
+    except socket.gaierror:
+        pass
+
+    now = time.monotonic()
+    cached = _DNS_CACHE.get(host)
+    if cached is not None and cached[2] > now:
+        return cached[0], cached[1]
+
+    info = socket.getaddrinfo(host, None, socket.AF_UNSPEC, socket.SOCK_STREAM)
+    family, ip = info[0][0], info[0][4][0]
+    if len(_DNS_CACHE) >= DNS_CACHE_SIZE:
+        _DNS_CACHE.clear()
+    _DNS_CACHE[host] = (family, ip, now + DNS_TTL_SECONDS)
+    return family, ip
+
+
+def resolve(host: str) -> str:
+    """
+    Löst einen Hostnamen in eine IP-Adresse (IPv4 oder IPv6) auf.
+
+    Siehe :func:`resolve_addr`; liefert nur die Adresse.
+
+    Raises
+    ------
+    OSError
+        Wenn der Name nicht aufgelöst werden kann.
+    """
+    return resolve_addr(host)[1]
+
+
+def _resolve_or_host(host: str) -> str:
+    """Wie :func:`resolve`, liefert bei Fehlern aber den Namen unverändert zurück."""
+    try:
+        return resolve(host)
+    except OSError:
+        return host
+
+
 def check_port(host: str, port: int, timeout: float = 0.5) -> bool:
     """
     Prüft ob ein TCP-Port erreichbar ist.
@@ -93,12 +191,144 @@ def check_port(host: str, port: int, timeout: float = 0.5) -> bool:
         True wenn Port offen, sonst False.
     """
     try:
-        with socket.create_connection((host, port), timeout=timeout):
-            return True
-    except (socket.timeout, ConnectionRefusedError, OSError):
+        # Adressfamilie aus der Auflösung – IPv4- und IPv6-Ziele
+        family, ip = resolve_addr(host)
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            # connect_ex liefert einen Fehlercode statt einer Exception –
+            # der häufige Fall "Port geschlossen" kommt ohne Exception aus.
+            return sock.connect_ex((ip, port)) == 0
+    except OSError:
         return False
 
 
+# connect() auf nicht-blockierende Sockets meldet "Verbindung läuft"
+_CONNECT_IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, getattr(errno, "WSAEWOULDBLOCK", errno.EWOULDBLOCK)}
+
+
+def check_ports_bulk(host: str, ports: list[int], timeout: float = 0.5) -> tuple[list[int], list[int]]:
+    """
+    Prüft mehrere TCP-Ports eines Hosts gleichzeitig ohne Threads.
+
+    Alle Verbindungen werden nicht-blockierend gestartet und anschließend
+    gemeinsam über einen Selector (epoll/kqueue/select) bis zum Timeout
+    eingesammelt. Die Laufzeit entspricht damit dem langsamsten Port statt
+    der Summe aller Timeouts.
+
+    Parameters
+    ----------
+    host : str
+        Ziel-Host (idealerweise bereits aufgelöste IP-Adresse).
+    ports : list[int]
+        Zu prüfende Ports.
+    timeout : float
+        Gemeinsamer Verbindungs-Timeout in Sekunden.
+
+    Returns
+    -------
+    tuple[list[int], list[int]]
+        (offene Ports, geschlossene Ports) in der Reihenfolge von ``ports``.
+    """
+    try:
+        # Einmal auflösen; die Adressfamilie bestimmt den Socket-Typ (IPv4/IPv6)
+        family, ip = resolve_addr(host)
+    except OSError:
+        return [], list(ports)
+
+    states: dict[int, bool] = {}
+    with selectors.DefaultSelector() as sel:
+        try:
+            for port in ports:
+                try:
+                    sock = socket.socket(family, socket.SOCK_STREAM)
+                except OSError:
+                    states[port] = False
+                    continue
+                sock.setblocking(False)
+                try:
+                    err = sock.connect_ex((ip, port))
+                except OSError:
+                    err = -1
+                if err in _CONNECT_IN_PROGRESS:
+                    sel.register(sock, selectors.EVENT_WRITE, port)
+                    continue
+                states[port] = err == 0
+                sock.close()
+
+            deadline = time.monotonic() + timeout
+            while sel.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                for key, _ in sel.select(remaining):
+                    sock = key.fileobj
+                    states[key.data] = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+                    sel.unregister(sock)
+                    sock.close()
+        finally:
+            # Bis zum Timeout unbeantwortete Verbindungen gelten als geschlossen
+            for key in list(sel.get_map().values()):
+                key.fileobj.close()
+
+    open_ports = [p for p in ports if states.get(p, False)]
+    closed_ports = [p for p in ports if not states.get(p, False)]
+    return open_ports, closed_ports
+
+
+async def check_port_async(host: str, port: int, timeout: float = 0.5) -> bool:
+    """
+    Asynchrone Variante von :func:`check_port`.
+
+    Mehrere Aufrufe können per ``asyncio.gather`` parallel laufen, sodass sich
+    die Timeouts nicht addieren.
+
+    Parameters
+    ----------
+    host : str
+        Ziel-Host.
+    port : int
+        Zu prüfender Port.
+    timeout : float
+        Verbindungs-Timeout in Sekunden.
+
+    Returns
+    -------
+    bool
+        True wenn Port offen, sonst False.
+    """
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (asyncio.TimeoutError, ConnectionRefusedError, OSError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+def _build_result(
+    host: str,
+    ping_ok: bool,
+    latency: Optional[float],
+    open_ports: list[int],
+    closed_ports: list[int],
+) -> CheckResult:
+    """Erstellt das CheckResult und protokolliert das Ergebnis."""
+    result = CheckResult(
+        host=host,
+        timestamp=datetime.now(),
+        ping_ok=ping_ok,
+        ping_latency_ms=latency,
+        open_ports=open_ports,
+        closed_ports=closed_ports,
+    )
+    logger.info("  → %s | Latenz: %s ms | Offen: %s | Geschlossen: %s",
+                result.status, latency, open_ports, closed_ports)
+    return result
+
+
 def check_device(host: str, ports: list[int] | None = None) -> CheckResult:
     """
     Führt eine vollständige Prüfung eines Netzwerkgeräts durch.
@@ -119,24 +349,76 @@ def check_device(host: str, ports: list[int] | None = None) -> CheckResult:
         ports = [22, 80, 443]
 
     logger.info("Prüfe %s (Ports: %s)...", host, ports)
-    ping_ok, latency = ping_host(host)
+    # Einmal auflösen statt eines DNS-Lookups für den Ping und je Port
+    ip = _resolve_or_host(host)
+    ping_ok, latency = ping_host(ip)
+
+    open_ports, closed_ports = [], []
+    if ping_ok and ports:
+        # Alle Ports in einem Durchgang – die Timeouts summieren sich nicht auf
+        open_ports, closed_ports = check_ports_bulk(ip, ports)
+
+    return _build_result(host, ping_ok, latency, open_ports, closed_ports)
+
+
+async def check_device_async(
+    host: str,
+    ports: list[int] | None = None,
+    ping: tuple[bool, Optional[float]] | None = None,
+) -> CheckResult:
+    """
+    Asynchrone Variante von :func:`check_device`.
+
+    Der Ping läuft im Default-Executor (``ping`` ist ein blockierender
+    Subprozess), die Port-Checks laufen gleichzeitig per ``asyncio.gather``.
+    Die Laufzeit pro Gerät entspricht damit etwa dem langsamsten Port statt
+    der Summe aller Port-Timeouts.
+
+    Parameters
+    ----------
+    host : str
+        Hostname oder IP-Adresse des Geräts.
+    ports : list[int], optional
+        Liste der zu prüfenden Ports. Standard: [22, 80, 443].
+    ping : tuple[bool, Optional[float]], optional
+        Bereits vorliegendes Ping-Ergebnis (z. B. aus :func:`icmp.ping_many`).
+        Ohne Angabe wird der Host per :func:`ping_host` geprüft.
+
+    Returns
+    -------
+    CheckResult
+        Gesamtergebnis der Prüfung.
+    """
+    if ports is None:
+        ports = [22, 80, 443]
+
+    logger.info("Prüfe %s (Ports: %s)...", host, ports)
+    loop = asyncio.get_running_loop()
+    ip = await loop.run_in_executor(None, _resolve_or_host, host)
+    if ping is None:
+        ping = await loop.run_in_executor(None, ping_host, ip)
+    ping_ok, latency = ping
 
     open_ports, closed_ports = [], []
     if ping_ok:
-        for port in ports:
-            if check_port(host, port):
-                open_ports.append(port)
-            else:
-                closed_ports.append(port)
+        states = await asyncio.gather(*(check_port_async(ip, p) for p in ports))
+        for port, is_open in zip(ports, states):
+            (open_ports if is_open else closed_ports).append(port)
 
-    result = CheckResult(
-        host=host,
-        timestamp=datetime.now(),
-        ping_ok=ping_ok,
-        ping_latency_ms=latency,
-        open_ports=open_ports,
-        closed_ports=closed_ports,
-    )
-    logger.info("  → %s | Latenz: %s ms | Offen: %s | Geschlossen: %s",
-                result.status, latency, open_ports, closed_ports)
-    return result
+    return _build_result(host, ping_ok, latency, open_ports, closed_ports)
+
+
+async def check_devices_async(
+    devices: list[dict],
+    pings: dict[str, tuple[bool, Optional[float]]] | None = None,
+) -> list[CheckResult]:
+    """
+    Prüft alle Geräte gleichzeitig; Reihenfolge entspricht ``devices``.
+
+    ``pings`` enthält optional vorab ermittelte Ping-Ergebnisse je Host.
+    """
+    pings = pings or {}
+    return await asyncio.gather(*(
+        check_device_async(d["host"], d.get("ports", [22, 80, 443]), pings.get(d["host"]))
+        for d in devices
+    ))
@@ -1,37 +1,88 @@
 """
 Report-Generator für Network Monitor.
-Erstellt strukturierte JSON-Logs und einen HTML-Statusbericht.
+Erstellt strukturierte JSON-Logs, einen HTML-Statusbericht und schreibt
+alle Ergebnisse fortlaufend in eine SQLite-Datenbank.
 """
 
 import json
 import logging
+import sqlite3
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
-from monitor import CheckResult
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from monitor import CheckResult, count_statuses
+
+try:
+    import orjson
+except ImportError:  # Fallback auf das langsamere json-Modul der Standardbibliothek
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
 REPORT_DIR = Path("docs")
 REPORT_DIR.mkdir(exist_ok=True)
 
+STATUS_COLORS = {"ONLINE": "#2ecc71", "DEGRADED": "#f39c12", "OFFLINE": "#e74c3c"}
+
+# Fortlaufender Ergebnis-Speicher: eine Zeile je Host und Scan
+STORE_PATH = REPORT_DIR / "reports.db"
+_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    scan_at         TEXT    NOT NULL,
+    host            TEXT    NOT NULL,
+    timestamp       TEXT    NOT NULL,
+    status          TEXT    NOT NULL,
+    ping_ok         INTEGER NOT NULL,
+    ping_latency_ms REAL,
+    open_ports      TEXT    NOT NULL,
+    closed_ports    TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_scan_host ON results (scan_at, host);
+"""
+
+# Template wird einmal kompiliert und über alle --loop-Durchläufe wiederverwendet
+_TEMPLATE_ENV = Environment(
+    loader=FileSystemLoader(Path(__file__).parent / "templates"),
+    autoescape=select_autoescape(["html", "j2"]),
+    auto_reload=False,
+)
+HTML_TEMPLATE = _TEMPLATE_ENV.get_template("report.html.j2")
+
+
+def _result_to_dict(r: CheckResult) -> dict:
+    """Konvertiert ein CheckResult in ein JSON-serialisierbares Dict."""
+    return {
+        "host": r.host,
+        "timestamp": r.timestamp.isoformat(),
+        "status": r.status,
+        "ping_ok": r.ping_ok,
+        "ping_latency_ms": r.ping_latency_ms,
+        "open_ports": r.open_ports,
+        "closed_ports": r.closed_ports,
+    }
+
 
 def results_to_dict(results: list[CheckResult]) -> list[dict]:
     """Konvertiert CheckResult-Objekte in JSON-serialisierbare Dicts."""
-    return [
-        {
-            "host": r.host,
-            "timestamp": r.timestamp.isoformat(),
-            "status": r.status,
-            "ping_ok": r.ping_ok,
-            "ping_latency_ms": r.ping_latency_ms,
-            "open_ports": r.open_ports,
-            "closed_ports": r.closed_ports,
-        }
-        for r in results
-    ]
+    return [_result_to_dict(r) for r in results]
 
 
-def save_json_log(results: list[CheckResult], path: Path | None = None) -> Path:
+def _json_default(obj):
+    """Serialisiert CheckResult-Objekte direkt beim Schreiben (ohne Zwischenliste)."""
+    if isinstance(obj, CheckResult):
+        return _result_to_dict(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Typ nicht JSON-serialisierbar: {type(obj).__name__}")
+
+
+def save_json_log(
+    results: list[CheckResult],
+    path: Path | None = None,
+    counts: Counter | None = None,
+) -> Path:
     """
     Speichert Prüfergebnisse als JSON-Log.
 
@@ -41,6 +92,8 @@ def save_json_log(results: list[CheckResult], path: Path | None = None) -> Path:
         Liste der Prüfergebnisse.
     path : Path, optional
         Zielpfad. Standard: docs/report_<timestamp>.json
+    counts : Counter, optional
+        Bereits ermittelte Status-Zählung (siehe :func:`monitor.count_statuses`).
 
     Returns
     -------
@@ -50,24 +103,79 @@ def save_json_log(results: list[CheckResult], path: Path | None = None) -> Path:
     if path is None:
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         path = REPORT_DIR / f"report_{ts}.json"
+    if counts is None:
+        counts = count_statuses(results)
 
     payload = {
         "generated_at": datetime.now().isoformat(),
         "total_hosts": len(results),
-        "online": sum(1 for r in results if r.status == "ONLINE"),
-        "degraded": sum(1 for r in results if r.status == "DEGRADED"),
-        "offline": sum(1 for r in results if r.status == "OFFLINE"),
-        "results": results_to_dict(results),
+        "online": counts["ONLINE"],
+        "degraded": counts["DEGRADED"],
+        "offline": counts["OFFLINE"],
+        "results": results,
     }
 
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2, ensure_ascii=False)
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(
+            payload,
+            default=_json_default,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_PASSTHROUGH_DATACLASS,
+        ))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2, ensure_ascii=False, default=_json_default)
 
     logger.info("JSON-Report gespeichert: %s", path)
     return path
 
 
-def save_html_report(results: list[CheckResult], path: Path | None = None) -> Path:
+def save_to_store(results: list[CheckResult], db_path: Path | None = None) -> Path:
+    """
+    Hängt die Prüfergebnisse eines Scans an die SQLite-Datenbank an.
+
+    Im Gegensatz zu den JSON-Logs muss die Historie für die Plots so nicht
+    bei jedem Durchlauf neu geparst werden; die Ports werden als JSON-Listen
+    gespeichert.
+
+    Parameters
+    ----------
+    results : list[CheckResult]
+        Liste der Prüfergebnisse.
+    db_path : Path, optional
+        Pfad zur Datenbank. Standard: docs/reports.db
+
+    Returns
+    -------
+    Path
+        Pfad zur Datenbank.
+    """
+    if db_path is None:
+        db_path = STORE_PATH
+
+    scan_at = datetime.now().isoformat()
+    rows = [
+        (scan_at, r.host, r.timestamp.isoformat(), r.status, int(r.ping_ok),
+         r.ping_latency_ms, json.dumps(r.open_ports), json.dumps(r.closed_ports))
+        for r in results
+    ]
+
+    con = sqlite3.connect(db_path)
+    try:
+        con.executescript(_STORE_SCHEMA)
+        with con:
+            con.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    finally:
+        con.close()
+
+    logger.info("%d Ergebnisse gespeichert: %s", len(rows), db_path)
+    return db_path
+
+
+def save_html_report(
+    results: list[CheckResult],
+    path: Path | None = None,
+    counts: Counter | None = None,
+) -> Path:
     """
     Erstellt einen übersichtlichen HTML-Statusbericht.
 
@@ -77,6 +185,8 @@ def save_html_report(results: list[CheckResult], path: Path | None = None) -> Pa
         Liste der Prüfergebnisse.
     path : Path, optional
         Zielpfad. Standard: docs/report_<timestamp>.html
+    counts : Counter, optional
+        Bereits ermittelte Status-Zählung (siehe :func:`monitor.count_statuses`).
 
     Returns
     -------
@@ -86,68 +196,21 @@ def save_html_report(results: list[CheckResult], path: Path | None = None) -> Pa
     if path is None:
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         path = REPORT_DIR / f"report_{ts}.html"
+    if counts is None:
+        counts = count_statuses(results)
 
-    status_colors = {"ONLINE": "#2ecc71", "DEGRADED": "#f39c12", "OFFLINE": "#e74c3c"}
-
-    rows = ""
-    for r in results:
-        color = status_colors.get(r.status, "#bdc3c7")
-        latency = f"{r.ping_latency_ms} ms" if r.ping_latency_ms else "—"
-        open_p = ", ".join(str(p) for p in r.open_ports) or "—"
-        closed_p = ", ".join(str(p) for p in r.closed_ports) or "—"
-        rows += f"""
-        <tr>
-          <td>{r.host}</td>
-          <td style="color:{color};font-weight:bold">{r.status}</td>
-          <td>{latency}</td>
-          <td>{open_p}</td>
-          <td style="color:#e74c3c">{closed_p}</td>
-          <td>{r.timestamp.strftime('%H:%M:%S')}</td>
-        </tr>"""
-
-    online = sum(1 for r in results if r.status == "ONLINE")
-    offline = sum(1 for r in results if r.status == "OFFLINE")
-    degraded = sum(1 for r in results if r.status == "DEGRADED")
-
-    html = f"""<!DOCTYPE html>
-<html lang="de">
-<head>
-  <meta charset="UTF-8">
-  <title>Network Monitor Report</title>
-  <style>
-    body {{ font-family: 'Segoe UI', sans-serif; background: #1a1a2e; color: #eee; margin: 0; padding: 20px; }}
-    h1 {{ color: #00d4ff; border-bottom: 2px solid #00d4ff; padding-bottom: 8px; }}
-    .summary {{ display: flex; gap: 20px; margin: 20px 0; }}
-    .card {{ background: #16213e; border-radius: 8px; padding: 16px 24px; text-align: center; min-width: 100px; }}
-    .card .num {{ font-size: 2em; font-weight: bold; }}
-    .card .label {{ font-size: 0.85em; color: #aaa; }}
-    table {{ width: 100%; border-collapse: collapse; background: #16213e; border-radius: 8px; overflow: hidden; }}
-    th {{ background: #0f3460; padding: 12px; text-align: left; }}
-    td {{ padding: 10px 12px; border-bottom: 1px solid #2a2a4a; }}
-    tr:hover td {{ background: #1e3a5f; }}
-    .ts {{ color: #888; font-size: 0.85em; margin-top: 20px; }}
-  </style>
-</head>
-<body>
-  <h1>🖧 Network Monitor — Statusbericht</h1>
-  <div class="summary">
-    <div class="card"><div class="num" style="color:#2ecc71">{online}</div><div class="label">ONLINE</div></div>
-    <div class="card"><div class="num" style="color:#f39c12">{degraded}</div><div class="label">DEGRADED</div></div>
-    <div class="card"><div class="num" style="color:#e74c3c">{offline}</div><div class="label">OFFLINE</div></div>
-    <div class="card"><div class="num" style="color:#00d4ff">{len(results)}</div><div class="label">GESAMT</div></div>
-  </div>
-  <table>
-    <thead>
-      <tr><th>Host</th><th>Status</th><th>Latenz</th><th>Offene Ports</th><th>Geschlossene Ports</th><th>Zeit</th></tr>
-    </thead>
-    <tbody>{rows}</tbody>
-  </table>
-  <p class="ts">Generiert: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}</p>
-</body>
-</html>"""
-
+    # Zeilen werden beim Rendern direkt in die Datei geschrieben,
+    # statt das komplette Dokument vorher im Speicher aufzubauen.
     with open(path, "w", encoding="utf-8") as f:
-        f.write(html)
+        HTML_TEMPLATE.stream(
+            results=results,
+            status_colors=STATUS_COLORS,
+            online=counts["ONLINE"],
+            degraded=counts["DEGRADED"],
+            offline=counts["OFFLINE"],
+            total=len(results),
+            generated_at=datetime.now(),
+        ).dump(f)
 
     logger.info("HTML-Report gespeichert: %s", path)
     return path
@@ -3,14 +3,22 @@ Unit-Tests für Network Monitor.
 Ausführen: pytest tests/test_monitor.py -v
 """
 
+import asyncio
 import sys
 from pathlib import Path
 from unittest.mock import patch
 from datetime import datetime
+import json
+import tempfile
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from monitor import ping_host, check_port, check_device, CheckResult
+import icmp
+import monitor
+from monitor import (
+    ping_host, check_port, check_ports_bulk, check_device, check_device_async, check_port_async,
+    CheckResult, count_statuses, resolve,
+)
 
 
 # ---------------------------------------------------------------------------
@@ -32,6 +40,17 @@ def test_ping_unreachable_host():
     assert latency is None
 
 
+def test_ping_latency_parsed_from_output():
+    """Latenz stammt aus der ping-Ausgabe, nicht aus der Prozesslaufzeit."""
+    import subprocess
+    linux = b"64 bytes from 127.0.0.1: icmp_seq=1 ttl=64 time=0.045 ms\n"
+    windows = b"Antwort von 192.168.1.1: Bytes=32 Zeit=12ms TTL=64\r\n"
+    for stdout, expected in ((linux, 0.04), (windows, 12.0)):
+        done = subprocess.CompletedProcess([], 0, stdout=stdout, stderr=b"")
+        with patch("monitor.subprocess.run", return_value=done):
+            assert ping_host("127.0.0.1") == (True, expected)
+
+
 # ---------------------------------------------------------------------------
 # check_port
 # ---------------------------------------------------------------------------
@@ -48,6 +67,62 @@ def test_port_check_returns_bool():
     assert result is False
 
 
+def test_port_open_on_loopback():
+    """Ein lokal lauschender Port wird als offen erkannt."""
+    import socket
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        assert check_port("127.0.0.1", server.getsockname()[1], timeout=0.3) is True
+
+
+def _ipv6_listener():
+    """Lauschender Socket auf ::1, oder None wenn IPv6 nicht verfügbar ist."""
+    import socket
+    try:
+        server = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+    except OSError:
+        return None
+    try:
+        server.bind(("::1", 0))
+    except OSError:
+        server.close()
+        return None
+    server.listen()
+    return server
+
+
+def test_port_open_on_ipv6_loopback():
+    """IPv6-Ziele werden über einen IPv6-Socket geprüft."""
+    server = _ipv6_listener()
+    if server is None:
+        return  # ohne IPv6-Loopback nicht prüfbar
+    with server:
+        assert check_port("::1", server.getsockname()[1], timeout=0.3) is True
+
+
+def test_ports_bulk_on_loopback():
+    """Bulk-Check trennt offene und geschlossene Ports in Eingabereihenfolge."""
+    import socket
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        port = server.getsockname()[1]
+        open_ports, closed_ports = check_ports_bulk("127.0.0.1", [1, port], timeout=0.3)
+    assert open_ports == [port]
+    assert closed_ports == [1]
+
+
+def test_ports_bulk_on_ipv6_loopback():
+    """Bulk-Check erkennt offene Ports auch bei IPv6-Zielen."""
+    server = _ipv6_listener()
+    if server is None:
+        return  # ohne IPv6-Loopback nicht prüfbar
+    with server:
+        port = server.getsockname()[1]
+        assert check_ports_bulk("::1", [port, 1], timeout=0.3) == ([port], [1])
+
+
 # ---------------------------------------------------------------------------
 # CheckResult dataclass
 # ---------------------------------------------------------------------------
@@ -67,6 +142,54 @@ def test_status_offline():
     assert r.status == "OFFLINE"
 
 
+def test_count_statuses():
+    results = [
+        CheckResult("a", datetime.now(), True, 1.0, [80], []),
+        CheckResult("b", datetime.now(), True, 1.0, [80], [443]),
+        CheckResult("c", datetime.now(), True, 1.0, [22], []),
+    ]
+    counts = count_statuses(results)
+    assert counts["ONLINE"] == 2 and counts["DEGRADED"] == 1
+    assert counts["OFFLINE"] == 0
+
+
+# ---------------------------------------------------------------------------
+# resolve – DNS-Cache
+# ---------------------------------------------------------------------------
+
+def test_resolve_ip_literal_skips_dns():
+    """IP-Literale (IPv4 und IPv6) werden ohne Resolver-Anfrage zurückgegeben."""
+    import socket
+    real_getaddrinfo = socket.getaddrinfo
+
+    def numeric_only(host, port, family=0, type=0, proto=0, flags=0):
+        assert flags & socket.AI_NUMERICHOST, "Resolver-Anfrage für IP-Literal"
+        return real_getaddrinfo(host, port, family, type, proto, flags)
+
+    with patch("monitor.socket.getaddrinfo", side_effect=numeric_only):
+        assert resolve("192.168.1.1") == "192.168.1.1"
+        assert monitor.resolve_addr("::1") == (socket.AF_INET6, "::1")
+
+
+def test_resolve_caches_hostnames():
+    """Ein Hostname wird innerhalb der TTL nur einmal aufgelöst – auch IPv6-only."""
+    import socket
+    lookups = []
+
+    def fake_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+        if flags & socket.AI_NUMERICHOST:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        lookups.append(host)
+        return [(socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("fd00::5", 0, 0, 0))]
+
+    monitor._DNS_CACHE.pop("printer.lan", None)
+    with patch("monitor.socket.getaddrinfo", side_effect=fake_getaddrinfo):
+        assert resolve("printer.lan") == "fd00::5"
+        assert monitor.resolve_addr("printer.lan") == (socket.AF_INET6, "fd00::5")
+    assert lookups == ["printer.lan"]
+    monitor._DNS_CACHE.pop("printer.lan", None)
+
+
 # ---------------------------------------------------------------------------
 # check_device – mit Mock für schnelle Tests
 # ---------------------------------------------------------------------------
@@ -74,7 +197,7 @@ def test_status_offline():
 def test_check_device_online():
     """Simuliert einen erreichbaren Host mit offenen Ports."""
     with patch("monitor.ping_host", return_value=(True, 3.5)), \
-         patch("monitor.check_port", return_value=True):
+         patch("monitor.check_ports_bulk", return_value=([80, 443], [])):
         result = check_device("192.168.1.1", ports=[80, 443])
     assert result.ping_ok is True
     assert result.open_ports == [80, 443]
@@ -93,25 +216,156 @@ def test_check_device_offline():
 
 def test_check_device_default_ports():
     """Ohne Port-Angabe werden Standard-Ports [22, 80, 443] geprüft."""
+    def mock_bulk(host, ports, timeout=0.5):
+        return list(ports), []
+
     with patch("monitor.ping_host", return_value=(True, 2.0)), \
-         patch("monitor.check_port", return_value=True):
+         patch("monitor.check_ports_bulk", side_effect=mock_bulk):
         result = check_device("127.0.0.1")
     assert set(result.open_ports) == {22, 80, 443}
 
 
 def test_check_device_degraded():
     """Simuliert Host erreichbar aber ein Port geschlossen."""
-    def mock_port(host, port, timeout=0.5):
-        return port != 443  # Port 443 geschlossen
+    def mock_bulk(host, ports, timeout=0.5):
+        # Port 443 geschlossen
+        return [p for p in ports if p != 443], [p for p in ports if p == 443]
 
     with patch("monitor.ping_host", return_value=(True, 4.0)), \
-         patch("monitor.check_port", side_effect=mock_port):
+         patch("monitor.check_ports_bulk", side_effect=mock_bulk):
         result = check_device("192.168.1.1", ports=[80, 443])
     assert result.status == "DEGRADED"
     assert 443 in result.closed_ports
     assert 80 in result.open_ports
 
 
+# ---------------------------------------------------------------------------
+# check_device_async – paralleler Scan
+# ---------------------------------------------------------------------------
+
+def test_port_async_returns_false_on_unreachable():
+    """check_port_async liefert False statt Exception bei Timeout."""
+    assert asyncio.run(check_port_async("192.0.2.1", 80, timeout=0.3)) is False
+
+
+def test_check_device_async_degraded():
+    """Async-Scan liefert dasselbe Ergebnis wie check_device."""
+    async def mock_port(host, port, timeout=0.5):
+        return port != 443
+
+    with patch("monitor.ping_host", return_value=(True, 4.0)), \
+         patch("monitor.check_port_async", side_effect=mock_port):
+        result = asyncio.run(check_device_async("192.168.1.1", ports=[80, 443]))
+    assert result.status == "DEGRADED"
+    assert result.open_ports == [80]
+    assert result.closed_ports == [443]
+
+
+def test_check_device_async_offline():
+    """Kein Port-Scan wenn der Ping fehlschlägt."""
+    with patch("monitor.ping_host", return_value=(False, None)), \
+         patch("monitor.check_port_async") as port_mock:
+        result = asyncio.run(check_device_async("192.168.1.99", ports=[80]))
+    assert result.status == "OFFLINE"
+    port_mock.assert_not_called()
+
+
+def test_check_device_async_uses_prepass_ping():
+    """Liegt ein Ping-Ergebnis vor, wird nicht erneut gepingt."""
+    async def mock_port(host, port, timeout=0.5):
+        return True
+
+    with patch("monitor.ping_host") as ping_mock, \
+         patch("monitor.check_port_async", side_effect=mock_port):
+        result = asyncio.run(check_device_async("192.168.1.1", [80], ping=(True, 2.0)))
+    ping_mock.assert_not_called()
+    assert result.ping_latency_ms == 2.0
+
+
+# ---------------------------------------------------------------------------
+# icmp – Batch-Pinger
+# ---------------------------------------------------------------------------
+
+def test_icmp_packet_checksum():
+    """Prüfsumme über das komplette Paket muss 0 ergeben (RFC 1071)."""
+    packet = icmp.build_echo_request(ident=0x1234, seq=7)
+    assert icmp._checksum(packet) == 0
+
+
+def test_ping_many_falls_back_without_socket():
+    """Ohne ICMP-Rechte wird pro Host der System-ping genutzt."""
+    with patch("icmp._open_icmp_socket", side_effect=PermissionError), \
+         patch("icmp.ping_host", return_value=(True, 1.5)):
+        result = icmp.ping_many(["10.0.0.1", "10.0.0.2", "10.0.0.1"])
+    assert result == {"10.0.0.1": (True, 1.5), "10.0.0.2": (True, 1.5)}
+
+
+def test_ping_many_ipv6_uses_system_ping():
+    """IPv6-Hosts passen nicht auf den IPv4-ICMP-Socket und gehen an den System-ping."""
+    import socket
+    udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)  # Platzhalter ohne Antworten
+    with patch("icmp._open_icmp_socket", return_value=(udp, False)), \
+         patch("icmp.ping_host", return_value=(True, 2.0)) as ping_mock:
+        result = icmp.ping_many(["::1"], timeout=0.1)
+    assert result == {"::1": (True, 2.0)}
+    ping_mock.assert_called_once_with("::1", 1)
+
+
+# ---------------------------------------------------------------------------
+# reporter – JSON-Log
+# ---------------------------------------------------------------------------
+
+def test_json_log_roundtrip():
+    """JSON-Log enthält Zusammenfassung und serialisierte CheckResults."""
+    from reporter import save_json_log
+
+    results = [
+        CheckResult("192.168.1.1", datetime(2024, 1, 1, 12, 0), True, 5.0, [80], [443]),
+        CheckResult("192.168.1.2", datetime(2024, 1, 1, 12, 0), False, None, [], []),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        target = Path(tmp) / "report.json"
+        save_json_log(results, target)
+        data = json.loads(target.read_text(encoding="utf-8"))
+    assert data["total_hosts"] == 2
+    assert data["degraded"] == 1 and data["offline"] == 1
+    assert data["results"][0]["status"] == "DEGRADED"
+    assert data["results"][0]["timestamp"] == "2024-01-01T12:00:00"
+    assert data["results"][1]["ping_latency_ms"] is None
+
+
+def test_store_roundtrip():
+    """SQLite-Speicher liefert die Ergebnisse als Tabelle für die Plots zurück."""
+    from reporter import save_to_store
+    from visualizer import load_results
+
+    results = [
+        CheckResult("192.168.1.1", datetime(2024, 1, 1, 12, 0), True, 5.0, [80], [443]),
+        CheckResult("192.168.1.2", datetime(2024, 1, 1, 12, 0), False, None, [], []),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        save_to_store(results, Path(tmp) / "reports.db")
+        save_to_store(results[:1], Path(tmp) / "reports.db")
+        df = load_results(Path(tmp), max_scans=1)
+    assert list(df["host"]) == ["192.168.1.1"]
+    assert df["status"].iloc[0] == "DEGRADED"
+    assert df["open_ports"].iloc[0] == [80]
+    assert bool(df["ping_ok"].iloc[0]) is True
+
+
+# ---------------------------------------------------------------------------
+# visualizer – gleitende Latenz-Kennzahlen
+# ---------------------------------------------------------------------------
+
+def test_rolling_mean_window():
+    """Gleitender Mittelwert: NaN-Vorlauf, danach Mittel je Fenster."""
+    from visualizer import rolling_mean
+    mean = rolling_mean([1.0, 2.0, 3.0, 10.0], 3)
+    assert len(mean) == 4
+    assert all(v != v for v in mean[:2])
+    assert list(mean[2:]) == [2.0, 5.0]
+
+
 # ---------------------------------------------------------------------------
 # Manueller Test-Runner (ohne pytest)
 # ---------------------------------------------------------------------------
@@ -120,15 +374,33 @@ if __name__ == "__main__":
     tests = [
         test_ping_reachable_host,
         test_ping_unreachable_host,
+        test_ping_latency_parsed_from_output,
         test_port_closed_on_loopback,
         test_port_check_returns_bool,
+        test_port_open_on_loopback,
+        test_port_open_on_ipv6_loopback,
+        test_ports_bulk_on_loopback,
+        test_ports_bulk_on_ipv6_loopback,
         test_status_online,
         test_status_degraded,
         test_status_offline,
+        test_count_statuses,
+        test_resolve_ip_literal_skips_dns,
+        test_resolve_caches_hostnames,
         test_check_device_online,
         test_check_device_offline,
         test_check_device_default_ports,
         test_check_device_degraded,
+        test_port_async_returns_false_on_unreachable,
+        test_check_device_async_degraded,
+        test_check_device_async_offline,
+        test_check_device_async_uses_prepass_ping,
+        test_icmp_packet_checksum,
+        test_ping_many_falls_back_without_socket,
+        test_ping_many_ipv6_uses_system_ping,
+        test_json_log_roundtrip,
+        test_store_roundtrip,
+        test_rolling_mean_window,
     ]
     passed = 0
     for t in tests:
@@ -1,11 +1,14 @@
 """
 Visualisierungsmodul fuer Network Monitor.
-Erstellt 3 Plots aus den JSON-Logs: Status-Uebersicht, Latenz-Verlauf, Port-Heatmap.
+Erstellt 3 Plots aus der Ergebnis-Datenbank (bzw. den JSON-Logs):
+Status-Uebersicht, Latenz-Verlauf, Port-Heatmap.
 """
 
 import json
 import logging
-from datetime import datetime
+import os
+import sqlite3
+from functools import lru_cache
 from pathlib import Path
 
 import matplotlib
@@ -13,7 +16,14 @@ matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 import seaborn as sns
+import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    import orjson
+except ImportError:  # Fallback auf das json-Modul der Standardbibliothek
+    orjson = None
 
 logger = logging.getLogger(__name__)
 sns.set_theme(style="darkgrid")
@@ -23,6 +33,46 @@ PLOT_DIR.mkdir(exist_ok=True)
 
 STATUS_COLORS = {"ONLINE": "#2ecc71", "DEGRADED": "#f39c12", "OFFLINE": "#e74c3c"}
 
+# Von reporter.save_to_store geschriebene Datenbank (relativ zum Report-Verzeichnis)
+STORE_FILE = "reports.db"
+
+# Merkt sich, fuer welchen Report-Stand die Plots zuletzt erstellt wurden
+PLOT_STAMP = PLOT_DIR / ".plots_stamp"
+
+# Lange Latenzverlaeufe vereinfacht und in Bloecken rendern
+matplotlib.rcParams["path.simplify"] = True
+matplotlib.rcParams["agg.path.chunksize"] = 10000
+
+# Fensterbreite (Anzahl Scans) fuer den gleitenden Latenz-Mittelwert
+ROLLING_WINDOW = 5
+
+# PNG-Export: 100 dpi und schnelle zlib-Stufe - Dashboard-Grafiken brauchen
+# keine Druckaufloesung, die Dateien werden nur etwas groesser
+PLOT_DPI = 100
+PNG_OPTIONS = {"compress_level": 1}
+
+# Eine Figure fuer alle Plots: spart den Auf-/Abbau pro Plot (v. a. im --loop-Modus)
+_FIGURE: plt.Figure | None = None
+
+
+def _get_figure(figsize: tuple[float, float]) -> plt.Figure:
+    """Liefert die wiederverwendete Figure - geleert und auf ``figsize`` gesetzt."""
+    global _FIGURE
+    if _FIGURE is None:
+        _FIGURE = plt.figure(figsize=figsize)
+    else:
+        _FIGURE.clf()
+        _FIGURE.set_size_inches(figsize)
+    return _FIGURE
+
+
+def _save_figure(fig: plt.Figure, name: str) -> Path:
+    """Speichert die Figure als PNG in ``PLOT_DIR`` und gibt den Pfad zurueck."""
+    path = PLOT_DIR / name
+    fig.savefig(path, dpi=PLOT_DPI, pil_kwargs=PNG_OPTIONS)
+    logger.info("Plot gespeichert: %s", path)
+    return path
+
 
 def load_latest_reports(report_dir: Path = PLOT_DIR, max_reports: int = 20) -> list[dict]:
     """
@@ -40,31 +90,159 @@ def load_latest_reports(report_dir: Path = PLOT_DIR, max_reports: int = 20) -> l
     list[dict]
         Liste der geladenen Report-Dicts, chronologisch sortiert.
     """
-    files = sorted(report_dir.glob("report_*.json"))[-max_reports:]
-    reports = []
-    for f in files:
-        with open(f, "r", encoding="utf-8") as fh:
-            reports.append(json.load(fh))
-    return reports
+    entries = _list_reports(report_dir)[-max_reports:]
+    return [_read_report(e.path, e.stat().st_mtime_ns) for e in entries]
+
+
+def _list_reports(report_dir: Path) -> list[os.DirEntry]:
+    """
+    Alle JSON-Reports im Verzeichnis, chronologisch sortiert.
+
+    ``os.scandir`` liefert die Namen ohne zusaetzlichen stat-Aufruf je Datei;
+    der Zeitstempel im Dateinamen sortiert lexikographisch korrekt.
+    """
+    try:
+        with os.scandir(report_dir) as it:
+            entries = [e for e in it if e.name.startswith("report_") and e.name.endswith(".json")]
+    except FileNotFoundError:
+        return []
+    entries.sort(key=lambda e: e.name)
+    return entries
+
+
+@lru_cache(maxsize=256)
+def _read_report(path: str, mtime_ns: int) -> dict:
+    """
+    Parst einen JSON-Report. Gecacht ueber (Pfad, mtime), sodass im
+    ``--loop``-Modus nur neu hinzugekommene Reports gelesen werden.
+    Das zurueckgegebene Dict wird geteilt und darf nicht veraendert werden.
+    """
+    loads = orjson.loads if orjson is not None else json.loads
+    return loads(Path(path).read_bytes())
+
+
+def reports_to_frame(reports: list[dict]) -> pd.DataFrame:
+    """
+    Flacht die Reports zu einer Tabelle ab (eine Zeile je Host und Scan).
+
+    Parameters
+    ----------
+    reports : list[dict]
+        Ausgabe von :func:`load_latest_reports`.
+
+    Returns
+    -------
+    pd.DataFrame
+        Spalten der Einzelergebnisse plus ``generated_at`` (datetime).
+    """
+    if not reports:
+        return pd.DataFrame()
+    df = pd.json_normalize(reports, record_path="results", meta=["generated_at"])
+    df["generated_at"] = pd.to_datetime(df["generated_at"])
+    return df
 
 
-def plot_status_overview(reports: list[dict]) -> Path:
+def load_store_frame(db_path: Path, max_scans: int = 20) -> pd.DataFrame:
+    """
+    Laedt die Ergebnisse der letzten Scans aus der SQLite-Datenbank.
+
+    Gelesen werden nur die Zeilen im Zeitfenster - die restliche Historie
+    bleibt unangetastet.
+
+    Parameters
+    ----------
+    db_path : Path
+        Pfad zur Datenbank (siehe :func:`reporter.save_to_store`).
+    max_scans : int
+        Maximale Anzahl zu ladender Scans.
+
+    Returns
+    -------
+    pd.DataFrame
+        Gleiche Spalten wie :func:`reports_to_frame`.
+    """
+    con = sqlite3.connect(db_path)
+    try:
+        df = pd.read_sql(
+            """
+            SELECT scan_at AS generated_at, host, timestamp, status,
+                   ping_ok, ping_latency_ms, open_ports, closed_ports
+            FROM results
+            WHERE scan_at >= (
+                SELECT MIN(scan_at) FROM (
+                    SELECT DISTINCT scan_at FROM results ORDER BY scan_at DESC LIMIT ?
+                )
+            )
+            ORDER BY scan_at
+            """,
+            con, params=[max_scans],
+        )
+    finally:
+        con.close()
+
+    df["generated_at"] = pd.to_datetime(df["generated_at"])
+    df["ping_ok"] = df["ping_ok"].astype(bool)
+    for col in ("open_ports", "closed_ports"):
+        df[col] = df[col].map(json.loads)
+    return df
+
+
+def load_results(report_dir: Path = PLOT_DIR, max_scans: int = 20) -> pd.DataFrame:
+    """
+    Ergebnisse der letzten Scans als Tabelle (eine Zeile je Host und Scan).
+
+    Bevorzugt wird die SQLite-Datenbank; ohne Datenbank werden die JSON-Reports
+    gelesen.
+    """
+    db_path = report_dir / STORE_FILE
+    if db_path.exists():
+        return load_store_frame(db_path, max_scans)
+    return reports_to_frame(load_latest_reports(report_dir, max_scans))
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Gleitender Mittelwert ueber ``window`` Werte.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Messwerte (float64), chronologisch sortiert.
+    window : int
+        Fensterbreite; bei kuerzeren Reihen wird auf ``len(x)`` gekuerzt.
+
+    Returns
+    -------
+    np.ndarray
+        Mittelwerte in der Laenge von ``x``; die ersten ``window - 1``
+        Positionen sind NaN.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    window = max(1, min(window, len(x)))
+    if not len(x):
+        return x.copy()
+    # Fenster als View ohne Kopie; die Aggregation laeuft komplett in numpy
+    windows = sliding_window_view(x, window)
+    return np.concatenate([np.full(window - 1, np.nan), windows.mean(axis=1)])
+
+
+def plot_status_overview(results: pd.DataFrame) -> Path:
     """
     Balkendiagramm: Anteil ONLINE / DEGRADED / OFFLINE ueber alle Scans.
     """
-    rows = []
-    for r in reports:
-        ts = datetime.fromisoformat(r["generated_at"]).strftime("%H:%M")
-        rows.append({
-            "Zeit": ts,
-            "ONLINE": r["online"],
-            "DEGRADED": r["degraded"],
-            "OFFLINE": r["offline"],
-        })
+    if results.empty:
+        logger.warning("Keine Ergebnisse vorhanden - ueberspringe Status-Uebersicht")
+        return None
 
-    df = pd.DataFrame(rows).set_index("Zeit")
+    df = (
+        pd.crosstab(results["generated_at"], results["status"])
+        .reindex(columns=list(STATUS_COLORS), fill_value=0)
+    )
+    df.index = df.index.strftime("%H:%M")
+    df.index.name = "Zeit"
 
-    fig, ax = plt.subplots(figsize=(12, 4))
+    fig = _get_figure((12, 4))
+    ax = fig.add_subplot(111)
     df.plot(
         kind="bar", stacked=True, ax=ax,
         color=[STATUS_COLORS["ONLINE"], STATUS_COLORS["DEGRADED"], STATUS_COLORS["OFFLINE"]],
@@ -75,109 +253,128 @@ def plot_status_overview(reports: list[dict]) -> Path:
     ax.set_ylabel("Anzahl Geraete")
     ax.set_xticklabels(df.index, rotation=45, ha="right")
     ax.legend(loc="upper right")
-    plt.tight_layout()
-
-    path = PLOT_DIR / "01_status_overview.png"
-    plt.savefig(path, dpi=150)
-    plt.close()
-    logger.info("Plot gespeichert: %s", path)
-    return path
+    fig.tight_layout()
+    return _save_figure(fig, "01_status_overview.png")
 
 
-def plot_latency_history(reports: list[dict]) -> Path:
+def plot_latency_history(results: pd.DataFrame) -> Path:
     """
     Liniendiagramm: Latenzentwicklung je Host ueber die Zeit.
     """
-    rows = []
-    for r in reports:
-        ts = datetime.fromisoformat(r["generated_at"])
-        for result in r["results"]:
-            if result["ping_ok"] and result["ping_latency_ms"] is not None:
-                rows.append({
-                    "Zeit": ts,
-                    "Host": result["host"],
-                    "Latenz_ms": result["ping_latency_ms"],
-                })
+    df = results
+    if not df.empty:
+        df = df[df["ping_ok"].astype(bool) & df["ping_latency_ms"].notna()]
 
-    if not rows:
+    if df.empty:
         logger.warning("Keine Latenzdaten vorhanden - ueberspringe Latenz-Plot")
         return None
 
-    df = pd.DataFrame(rows)
-
-    fig, ax = plt.subplots(figsize=(12, 5))
-    for host in df["Host"].unique():
-        sub = df[df["Host"] == host]
-        ax.plot(sub["Zeit"], sub["Latenz_ms"], marker="o", markersize=4, label=host, linewidth=1.5)
+    fig = _get_figure((12, 5))
+    ax = fig.add_subplot(111)
+    for host, sub in df.groupby("host", sort=False):
+        ts = sub["generated_at"].to_numpy()
+        latency = sub["ping_latency_ms"].to_numpy(dtype=np.float64)
+        line, = ax.plot(ts, latency, marker="o", markersize=4, label=host, linewidth=1.5)
+        # Gleitender Mittelwert als gestrichelte Trendlinie in Host-Farbe
+        mean = rolling_mean(latency, ROLLING_WINDOW)
+        ax.plot(ts, mean, linestyle="--", linewidth=1, color=line.get_color())
 
     ax.set_title("Latenzentwicklung je Host (ms)", fontsize=13, fontweight="bold", pad=10)
     ax.set_xlabel("Zeit")
     ax.set_ylabel("Latenz (ms)")
     ax.yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{x:.0f} ms"))
     ax.legend(title="Host", bbox_to_anchor=(1.01, 1), loc="upper left", fontsize=8)
-    plt.tight_layout()
-
-    path = PLOT_DIR / "02_latency_history.png"
-    plt.savefig(path, dpi=150)
-    plt.close()
-    logger.info("Plot gespeichert: %s", path)
-    return path
+    fig.tight_layout()
+    return _save_figure(fig, "02_latency_history.png")
 
 
-def plot_port_heatmap(reports: list[dict]) -> Path:
+def plot_port_heatmap(results: pd.DataFrame) -> Path:
     """
     Heatmap: Verfuegbarkeit je Host und Port ueber alle Scans.
     Wert 1 = offen, 0 = geschlossen, NaN = nicht geprueft.
     """
-    if not reports:
+    if results.empty:
         return None
 
-    latest = reports[-1]
-    rows = []
-    for result in latest["results"]:
-        host = result["host"]
-        for port in result["open_ports"]:
-            rows.append({"Host": host, "Port": str(port), "Status": 1})
-        for port in result["closed_ports"]:
-            rows.append({"Host": host, "Port": str(port), "Status": 0})
+    latest = results[results["generated_at"] == results["generated_at"].max()]
+    # Hosts ohne gepruefte Ports (z. B. OFFLINE) tauchen in der Heatmap nicht auf
+    rows = [
+        (host, open_ports, closed_ports)
+        for host, open_ports, closed_ports in zip(latest["host"], latest["open_ports"], latest["closed_ports"])
+        if open_ports or closed_ports
+    ]
 
     if not rows:
         logger.warning("Keine Port-Daten vorhanden - ueberspringe Port-Heatmap")
         return None
 
-    df = pd.DataFrame(rows)
-    pivot = df.pivot_table(index="Host", columns="Port", values="Status", aggfunc="mean")
-
-    fig, ax = plt.subplots(figsize=(max(6, len(pivot.columns) * 1.2), max(4, len(pivot) * 0.8)))
+    # Hoechstens ein paar Dutzend Zellen - direkt als numpy-Raster statt pivot_table
+    hosts = sorted({host for host, _, _ in rows})
+    ports = sorted({int(p) for _, open_ports, closed_ports in rows for p in (*open_ports, *closed_ports)})
+    host_idx = {host: i for i, host in enumerate(hosts)}
+    port_idx = {port: j for j, port in enumerate(ports)}
+    grid = np.full((len(hosts), len(ports)), np.nan)
+    for host, open_ports, closed_ports in rows:
+        i = host_idx[host]
+        for p in closed_ports:
+            grid[i, port_idx[int(p)]] = 0
+        for p in open_ports:
+            grid[i, port_idx[int(p)]] = 1
+
+    fig = _get_figure((max(6, len(ports) * 1.2), max(4, len(hosts) * 0.8)))
+    ax = fig.add_subplot(111)
     sns.heatmap(
-        pivot, annot=True, fmt=".0f", cmap="RdYlGn",
+        grid, annot=True, fmt=".0f", cmap="RdYlGn",
         vmin=0, vmax=1, linewidths=0.5, ax=ax,
+        xticklabels=ports, yticklabels=hosts,
         cbar_kws={"label": "1=offen  0=geschlossen"}
     )
     ax.set_title("Port-Status je Host (letzter Scan)", fontsize=13, fontweight="bold", pad=10)
     ax.set_ylabel("Host")
     ax.set_xlabel("Port")
-    plt.tight_layout()
-
-    path = PLOT_DIR / "03_port_heatmap.png"
-    plt.savefig(path, dpi=150)
-    plt.close()
-    logger.info("Plot gespeichert: %s", path)
-    return path
+    fig.tight_layout()
+    return _save_figure(fig, "03_port_heatmap.png")
+
+
+def _reports_stamp(report_dir: Path) -> str | None:
+    """Kennung des aktuellen Report-Stands (Anzahl + neueste mtime) oder None."""
+    db_path = report_dir / STORE_FILE
+    if db_path.exists():
+        st = db_path.stat()
+        return f"{db_path.resolve()}:{st.st_size}:{st.st_mtime_ns}"
+    entries = _list_reports(report_dir)
+    if not entries:
+        return None
+    latest = max(e.stat().st_mtime_ns for e in entries)
+    return f"{report_dir.resolve()}:{len(entries)}:{latest}"
 
 
 def generate_all_plots(report_dir: Path = PLOT_DIR) -> list[Path]:
-    """Laedt alle Reports und erstellt alle drei Plots."""
-    reports = load_latest_reports(report_dir)
-    if not reports:
+    """
+    Laedt alle Reports und erstellt alle drei Plots.
+
+    Haben sich die Reports seit dem letzten Aufruf nicht veraendert, werden
+    die vorhandenen Plots zurueckgegeben, ohne sie neu zu rendern.
+    """
+    stamp = _reports_stamp(report_dir)
+    if stamp is None:
         logger.warning("Keine Reports gefunden - zuerst einen Scan ausfuehren: python main.py")
         return []
 
+    if PLOT_STAMP.exists():
+        cached_stamp, *cached_paths = PLOT_STAMP.read_text(encoding="utf-8").splitlines()
+        paths = [Path(p) for p in cached_paths]
+        if cached_stamp == stamp and all(p.exists() for p in paths):
+            logger.info("Reports unveraendert - %d Plots wiederverwendet.", len(paths))
+            return paths
+
+    results = load_results(report_dir)
     paths = []
     for fn in [plot_status_overview, plot_latency_history, plot_port_heatmap]:
-        result = fn(reports)
+        result = fn(results)
         if result:
             paths.append(result)
 
+    PLOT_STAMP.write_text("\n".join([stamp, *map(str, paths)]), encoding="utf-8")
     logger.info("%d Plots erstellt.", len(paths))
     return paths
@@ -33,6 +33,13 @@ from pathlib import Path
 import numpy as np
 import pandas as pd
 
+from pipeline import machine_codes
+
+try:
+    import polars as pl
+except ImportError:  # Optional: nur für lazy_anomaly_detection
+    pl = None
+
 logger = logging.getLogger(__name__)
 
 # Schwellenwert Z-Score (Standardwert: 3 Sigma-Regel)
@@ -41,6 +48,11 @@ Z_THRESHOLD = 3.0
 # Multiplikator für IQR-Methode (Standardwert nach Tukey)
 IQR_MULTIPLIER = 1.5
 
+# Bits der Ergebnisspalte ``anomaly_flags`` (uint8)
+FLAG_ZSCORE = 0x1    # Z-Score über dem Schwellenwert
+FLAG_IQR = 0x2       # außerhalb der IQR-Grenzen
+FLAG_COMBINED = 0x4  # mindestens eine Methode schlägt an
+
 # Sensorspalten, die in die Anomalieerkennung einfließen
 SENSOR_COLS = [
     "temperature_c",
@@ -49,6 +61,17 @@ SENSOR_COLS = [
     "cycle_time_s",
 ]
 
+# Spalten der gespeicherten Anomalie-Scores; rollierende Features bleiben
+# im verarbeiteten Datensatz und werden hier nicht noch einmal abgelegt.
+SCORE_COLUMNS = [
+    "timestamp",
+    "machine_id",
+    "label",
+    "anomaly_flags",
+    *SENSOR_COLS,
+    *(f"{col}_zscore" for col in SENSOR_COLS),
+]
+
 
 # ---------------------------------------------------------------------------
 # Z-Score
@@ -64,21 +87,46 @@ def compute_z_scores(df: pd.DataFrame, cols: list[str] = SENSOR_COLS) -> pd.Data
     Parameters
     ----------
     df : pd.DataFrame
-        Eingabedatensatz mit Spalte ``machine_id``.
+        Eingabedatensatz mit Spalte ``machine_id``; wird in-place erweitert.
     cols : list[str]
         Spalten, für die der Z-Score berechnet werden soll.
 
     Returns
     -------
     pd.DataFrame
-        Datensatz mit zusätzlichen ``<col>_zscore``-Spalten.
+        ``df`` mit zusätzlichen ``<col>_zscore``-Spalten.
     """
-    df = df.copy()
-    for col in cols:
-        grp = df.groupby("machine_id")[col]
-        df[f"{col}_zscore"] = (
-            (df[col] - grp.transform("mean")) / grp.transform("std").replace(0, np.nan)
-        ).fillna(0)
+    zscore_cols = [f"{col}_zscore" for col in cols]
+    if len(df) == 0:
+        # np.add.reduceat verlangt mindestens eine Zeile
+        df[zscore_cols] = np.zeros((0, len(cols)))
+        return df
+
+    codes = machine_codes(df)
+    vals = df[cols].to_numpy(dtype=np.float64)
+
+    # Zeilen einmal nach Maschine ordnen; Summen je Maschine liefert dann
+    # np.add.reduceat über die zusammenhängenden Blöcke – ohne groupby.
+    order = np.argsort(codes, kind="stable")
+    starts = np.concatenate(([0], np.cumsum(np.bincount(codes))[:-1]))
+    observed = ~np.isnan(vals)
+    counts = np.add.reduceat(observed[order], starts, axis=0)
+    # Ungenutzte Kategorien ergeben leere Blöcke; deren Werte werden nie indiziert
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.add.reduceat(np.where(observed, vals, 0.0)[order], starts, axis=0) / counts
+
+    # Zweiter Durchlauf über die zentrierten Werte: numerisch stabil auch bei
+    # großen Absolutwerten (z. B. Betriebsstunden) im Gegensatz zu Σx² − n·x̄²
+    dev = vals - means[codes]
+    sq_dev = np.where(observed, dev * dev, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stds = np.sqrt(np.add.reduceat(sq_dev[order], starts, axis=0) / (counts - 1))
+
+    # Division nur, wo sie definiert ist; konstante Signale (std == 0),
+    # Einzelwerte (std NaN) und fehlende Messungen behalten den Z-Score 0.
+    z = np.zeros_like(dev)
+    np.divide(dev, stds[codes], out=z, where=(stds > 0)[codes] & observed)
+    df[zscore_cols] = z
     logger.debug("Z-Scores berechnet für: %s", cols)
     return df
 
@@ -93,7 +141,7 @@ def flag_zscore_anomalies(
     Parameters
     ----------
     df : pd.DataFrame
-        Datensatz mit berechneten Z-Score-Spalten.
+        Datensatz mit berechneten Z-Score-Spalten; wird in-place erweitert.
     cols : list[str]
         Basis-Sensorspalten (ohne ``_zscore``-Suffix).
     threshold : float
@@ -102,9 +150,8 @@ def flag_zscore_anomalies(
     Returns
     -------
     pd.DataFrame
-        Datensatz mit neuer Spalte ``anomaly_zscore`` (bool).
+        ``df`` mit neuer Spalte ``anomaly_zscore`` (bool).
     """
-    df = df.copy()
     zscore_cols = [f"{c}_zscore" for c in cols]
     df["anomaly_zscore"] = (df[zscore_cols].abs() > threshold).any(axis=1)
     n = df["anomaly_zscore"].sum()
@@ -141,18 +188,24 @@ def compute_iqr_bounds(
     dict
         ``{sensor: {"lower": float, "upper": float}}``
     """
+    values = df[cols].to_numpy(dtype=np.float64)
+    if len(values) == 0:
+        # Wie pandas: Quantile eines leeren Datensatzes sind NaN
+        q1 = q3 = np.full(len(cols), np.nan)
+    else:
+        # Ein Quantil-Aufruf für alle Spalten; NaN werden wie bei pandas ignoriert
+        quantile = np.nanquantile if np.isnan(values).any() else np.quantile
+        q1, q3 = quantile(values, [0.25, 0.75], axis=0)
+    iqr = q3 - q1
+    lower = q1 - multiplier * iqr
+    upper = q3 + multiplier * iqr
+
     bounds: dict[str, dict[str, float]] = {}
-    for col in cols:
-        q1 = df[col].quantile(0.25)
-        q3 = df[col].quantile(0.75)
-        iqr = q3 - q1
-        bounds[col] = {
-            "lower": q1 - multiplier * iqr,
-            "upper": q3 + multiplier * iqr,
-        }
+    for j, col in enumerate(cols):
+        bounds[col] = {"lower": float(lower[j]), "upper": float(upper[j])}
         logger.debug(
             "IQR %s: Q1=%.3f, Q3=%.3f, IQR=%.3f → [%.3f, %.3f]",
-            col, q1, q3, iqr, bounds[col]["lower"], bounds[col]["upper"],
+            col, q1[j], q3[j], iqr[j], lower[j], upper[j],
         )
     return bounds
 
@@ -167,7 +220,7 @@ def flag_iqr_anomalies(
     Parameters
     ----------
     df : pd.DataFrame
-        Eingabedatensatz.
+        Eingabedatensatz; wird in-place erweitert.
     bounds : dict
         Ausgabe von :func:`compute_iqr_bounds`.
     cols : list[str]
@@ -176,16 +229,13 @@ def flag_iqr_anomalies(
     Returns
     -------
     pd.DataFrame
-        Datensatz mit neuer Spalte ``anomaly_iqr`` (bool).
+        ``df`` mit neuer Spalte ``anomaly_iqr`` (bool).
     """
-    df = df.copy()
-    masks = pd.DataFrame(index=df.index)
-    for col in cols:
-        lo = bounds[col]["lower"]
-        hi = bounds[col]["upper"]
-        masks[col] = (df[col] < lo) | (df[col] > hi)
-
-    df["anomaly_iqr"] = masks.any(axis=1)
+    # Ein Vergleich über den gesamten Sensorblock statt einer Maske je Spalte
+    values = df[cols].to_numpy()
+    lower = np.array([bounds[col]["lower"] for col in cols])
+    upper = np.array([bounds[col]["upper"] for col in cols])
+    df["anomaly_iqr"] = ((values < lower) | (values > upper)).any(axis=1)
     n = df["anomaly_iqr"].sum()
     logger.info("IQR-Anomalien: %d (%.2f %%)", n, n / len(df) * 100)
     return df
@@ -196,7 +246,7 @@ def flag_iqr_anomalies(
 # ---------------------------------------------------------------------------
 
 def combined_anomaly_score(df: pd.DataFrame) -> pd.DataFrame:
-    """Kombiniert Z-Score und IQR zu einem gemeinsamen Anomalie-Flag.
+    """Fasst Z-Score- und IQR-Flag zu einer Bitmaske zusammen.
 
     Ein Datenpunkt gilt als Anomalie, wenn *mindestens eine* der beiden
     Methoden anschlägt.  Diese konservative OR-Verknüpfung erhöht die
@@ -205,19 +255,29 @@ def combined_anomaly_score(df: pd.DataFrame) -> pd.DataFrame:
     Produktionsumgebungen, wo ein verpasster Defekt teurer ist als ein
     Fehlalarm.
 
+    Statt dreier bool-Spalten hält ``anomaly_flags`` alle drei Ergebnisse
+    in einem Byte je Zeile: ``FLAG_ZSCORE``, ``FLAG_IQR`` und
+    ``FLAG_COMBINED`` (abfragen z. B. mit ``df["anomaly_flags"] & FLAG_COMBINED``).
+
     Parameters
     ----------
     df : pd.DataFrame
-        Datensatz mit Spalten ``anomaly_zscore`` und ``anomaly_iqr``.
+        Datensatz mit Spalten ``anomaly_zscore`` und ``anomaly_iqr``;
+        wird in-place verändert.
 
     Returns
     -------
     pd.DataFrame
-        Datensatz mit neuer Spalte ``anomaly_combined`` (bool).
+        ``df`` mit neuer Spalte ``anomaly_flags`` (uint8); die beiden
+        Einzel-Flags werden entfernt.
     """
-    df = df.copy()
-    df["anomaly_combined"] = df["anomaly_zscore"] | df["anomaly_iqr"]
-    n = df["anomaly_combined"].sum()
+    flags = df["anomaly_zscore"].to_numpy(np.uint8) | (
+        df["anomaly_iqr"].to_numpy(np.uint8) << 1
+    )
+    flags |= (flags != 0).astype(np.uint8) << 2
+    df.drop(columns=["anomaly_zscore", "anomaly_iqr"], inplace=True)
+    df["anomaly_flags"] = flags
+    n = np.count_nonzero(flags & FLAG_COMBINED)
     logger.info("Kombinierte Anomalien: %d (%.2f %%)", n, n / len(df) * 100)
     return df
 
@@ -229,6 +289,9 @@ def combined_anomaly_score(df: pd.DataFrame) -> pd.DataFrame:
 def run_anomaly_detection(df: pd.DataFrame) -> pd.DataFrame:
     """Führt die gesamte Anomalieerkennung in einem Schritt aus.
 
+    Die Einzelschritte erweitern den Datensatz in-place; kopiert wird nur
+    einmal hier am Einstieg, damit die Eingabe unverändert bleibt.
+
     Parameters
     ----------
     df : pd.DataFrame
@@ -237,8 +300,9 @@ def run_anomaly_detection(df: pd.DataFrame) -> pd.DataFrame:
     Returns
     -------
     pd.DataFrame
-        Datensatz mit allen Anomalie-Flags und Z-Score-Spalten.
+        Kopie mit allen Anomalie-Flags und Z-Score-Spalten.
     """
+    df = df.copy()
     df = compute_z_scores(df)
     df = flag_zscore_anomalies(df)
     bounds = compute_iqr_bounds(df)
@@ -247,6 +311,112 @@ def run_anomaly_detection(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def save_anomaly_scores(
+    df: pd.DataFrame,
+    output_dir: Path = Path("data"),
+    fmt: str = "parquet",
+) -> Path:
+    """Speichert die Anomalie-Scores (nur ``SCORE_COLUMNS``).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Ausgabe von :func:`run_anomaly_detection`.
+    output_dir : Path
+        Zielverzeichnis.
+    fmt : str
+        Dateiformat: ``"parquet"`` (Default) oder ``"csv"``.
+
+    Returns
+    -------
+    Path
+        Pfad zur gespeicherten Datei.
+
+    Raises
+    ------
+    ValueError
+        Bei unbekanntem Format.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    filepath = output_dir / f"anomaly_scores.{fmt}"
+    scores = df[SCORE_COLUMNS]
+    if fmt == "parquet":
+        scores.to_parquet(filepath, engine="pyarrow", compression="zstd", index=False)
+    elif fmt == "csv":
+        scores.to_csv(filepath, index=False)
+    else:
+        raise ValueError(f"Unbekanntes Dateiformat: {fmt}")
+    logger.info("Anomalie-Scores gespeichert: %s", filepath.resolve())
+    return filepath
+
+
+# ---------------------------------------------------------------------------
+# Lazy-Variante (Polars)
+# ---------------------------------------------------------------------------
+
+def lazy_anomaly_detection(
+    lf: "pl.LazyFrame",
+    cols: list[str] = SENSOR_COLS,
+    threshold: float = Z_THRESHOLD,
+    multiplier: float = IQR_MULTIPLIER,
+) -> "pl.LazyFrame":
+    """Polars-Gegenstück zu :func:`run_anomaly_detection`.
+
+    Hängt Z-Scores (je Maschine) und die Bitmaske ``anomaly_flags`` aus
+    Z-Score- und IQR-Flag (globale Grenzen) als Ausdrücke an den Plan an,
+    ohne ihn auszuführen.
+
+    Parameters
+    ----------
+    lf : pl.LazyFrame
+        Plan aus :func:`pipeline.lazy_pipeline`.
+    cols : list[str]
+        Sensorspalten.
+    threshold : float
+        Z-Score-Grenzwert (Default: 3.0).
+    multiplier : float
+        IQR-Multiplikator (Default: 1.5).
+
+    Returns
+    -------
+    pl.LazyFrame
+        Plan mit ``<col>_zscore`` und ``anomaly_flags``.
+    """
+    if pl is None:
+        raise ImportError("lazy_anomaly_detection benötigt das Paket 'polars'.")
+
+    def zscore(col: str) -> "pl.Expr":
+        x = pl.col(col).cast(pl.Float64)
+        std = x.std().over("machine_id")
+        dev = x - x.mean().over("machine_id")
+        return pl.when(std > 0).then(dev / std).otherwise(0.0).alias(f"{col}_zscore")
+
+    def outside_iqr(col: str) -> "pl.Expr":
+        x = pl.col(col).cast(pl.Float64)
+        q1 = x.quantile(0.25, interpolation="linear")
+        q3 = x.quantile(0.75, interpolation="linear")
+        iqr = q3 - q1
+        return (x < q1 - multiplier * iqr) | (x > q3 + multiplier * iqr)
+
+    z_flag = pl.any_horizontal(pl.col(f"{col}_zscore").abs() > threshold for col in cols)
+    iqr_flag = pl.any_horizontal(outside_iqr(col) for col in cols)
+    flags = z_flag.cast(pl.UInt8) * FLAG_ZSCORE + iqr_flag.cast(pl.UInt8) * FLAG_IQR
+    return (
+        lf.with_columns(zscore(col) for col in cols)
+        .with_columns(anomaly_flags=flags)
+        .with_columns(
+            anomaly_flags=pl.when(pl.col("anomaly_flags") > 0)
+            .then(pl.col("anomaly_flags") | FLAG_COMBINED)
+            .otherwise(pl.col("anomaly_flags"))
+            .cast(pl.UInt8)
+        )
+    )
+
+
 if __name__ == "__main__":
     logging.basicConfig(
         level=logging.INFO,
@@ -256,6 +426,4 @@ if __name__ == "__main__":
 
     df_processed = run_pipeline()
     df_scored = run_anomaly_detection(df_processed)
-    out = Path("data/anomaly_scores.csv")
-    df_scored.to_csv(out, index=False)
-    logger.info("Anomalie-Scores gespeichert: %s", out)
+    save_anomaly_scores(df_scored)
@@ -19,9 +19,8 @@ Autor : Portfolio-Projekt Predictive Maintenance
 PEP 8 : Ja
 """
 
-import random
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
@@ -66,49 +65,6 @@ BASE_PARAMS: dict[str, dict] = {
 ANOMALY_FACTOR = (1.4, 2.2)
 
 
-# ---------------------------------------------------------------------------
-# Hilfsfunktionen
-# ---------------------------------------------------------------------------
-
-def _generate_sample(
-    machine_id: str,
-    timestamp: datetime,
-    operating_hours: float,
-    anomaly: bool = False,
-) -> dict:
-    """Erzeugt einen einzelnen Sensordatensatz.
-
-    Parameters
-    ----------
-    machine_id : str
-        Bezeichner der Maschine.
-    timestamp : datetime
-        Aufnahmezeitpunkt.
-    operating_hours : float
-        Kumulierte Betriebsstunden der Maschine.
-    anomaly : bool, optional
-        Falls True, werden die Sensorwerte mit einem Zufallsfaktor
-        außerhalb des Normalbereichs skaliert (Default: False).
-
-    Returns
-    -------
-    dict
-        Sensor-Datensatz als Dictionary.
-    """
-    factor = random.uniform(*ANOMALY_FACTOR) if anomaly else 1.0
-
-    row: dict = {"timestamp": timestamp, "machine_id": machine_id}
-
-    for sensor, params in BASE_PARAMS.items():
-        value = np.random.normal(params["mean"], params["std"]) * factor
-        # Physikalisch sinnvolle Untergrenze
-        row[sensor] = max(0.0, round(value, 3))
-
-    row["operating_hours"] = round(operating_hours, 1)
-    row["label"] = int(anomaly)
-    return row
-
-
 def generate_sensor_data(
     n_samples: int = 5_000,
     anomaly_rate: float = 0.05,
@@ -120,7 +76,11 @@ def generate_sensor_data(
 
     Die Funktion verteilt Messungen gleichmäßig über alle Maschinen
     in ``MACHINES``. Anomalien werden zufällig mit Wahrscheinlichkeit
-    ``anomaly_rate`` eingefügt.
+    ``anomaly_rate`` eingefügt; ihre Sensorwerte werden mit einem
+    Zufallsfaktor aus ``ANOMALY_FACTOR`` skaliert.
+
+    Alle Zufallswerte werden spaltenweise in einem Zug gezogen
+    (``np.random.Generator``) statt Zeile für Zeile.
 
     Parameters
     ----------
@@ -146,23 +106,36 @@ def generate_sensor_data(
     >>> len(df)
     100
     """
-    np.random.seed(seed)
-    random.seed(seed)
+    rng = np.random.default_rng(seed)
 
     if start_time is None:
         start_time = datetime(2024, 1, 1, 0, 0, 0)
 
-    records = []
-    op_hours: dict[str, float] = {m: random.uniform(500, 5_000) for m in MACHINES}
+    n_machines = len(MACHINES)
+    idx = np.arange(n_samples)
+    machine_idx = idx % n_machines
 
-    for i in range(n_samples):
-        machine = MACHINES[i % len(MACHINES)]
-        ts = start_time + timedelta(seconds=i * interval_seconds)
-        is_anomaly = random.random() < anomaly_rate
-        op_hours[machine] += interval_seconds / 3_600  # Stunden aufaddieren
-        records.append(_generate_sample(machine, ts, op_hours[machine], is_anomaly))
+    is_anomaly = rng.random(n_samples) < anomaly_rate
+    factor = np.where(is_anomaly, rng.uniform(*ANOMALY_FACTOR, size=n_samples), 1.0)
 
-    df = pd.DataFrame(records, columns=SENSOR_COLUMNS)
+    data: dict[str, object] = {
+        "timestamp": pd.Timestamp(start_time) + pd.to_timedelta(idx * interval_seconds, unit="s"),
+        "machine_id": np.asarray(MACHINES, dtype=object)[machine_idx],
+    }
+    for sensor, params in BASE_PARAMS.items():
+        values = rng.normal(params["mean"], params["std"], size=n_samples) * factor
+        # Physikalisch sinnvolle Untergrenze
+        data[sensor] = np.maximum(0.0, values.round(3))
+
+    # Betriebsstunden: Startwert je Maschine plus ein Intervall je eigener Messung
+    start_hours = rng.uniform(500, 5_000, size=n_machines)
+    n_measured = idx // n_machines + 1
+    data["operating_hours"] = (
+        start_hours[machine_idx] + n_measured * (interval_seconds / 3_600)
+    ).round(1)
+    data["label"] = is_anomaly.astype(np.int64)
+
+    df = pd.DataFrame(data, columns=SENSOR_COLUMNS)
     logger.info(
         "Datensatz erzeugt: %d Zeilen | %d Anomalien (%.1f %%)",
         len(df),
@@ -176,8 +149,15 @@ def generate_sensor_data(
 # Pipeline-Schritt: Rohdaten speichern
 # ---------------------------------------------------------------------------
 
-def save_raw_data(df: pd.DataFrame, output_dir: Path = Path("data")) -> Path:
-    """Speichert den generierten Datensatz als CSV im Rohformat.
+def save_raw_data(
+    df: pd.DataFrame,
+    output_dir: Path = Path("data"),
+    fmt: str = "parquet",
+) -> Path:
+    """Speichert den generierten Datensatz im Rohformat.
+
+    Parquet (Default) speichert die Spalten typisiert und komprimiert;
+    CSV bleibt für die Weiterverarbeitung in anderen Werkzeugen verfügbar.
 
     Parameters
     ----------
@@ -185,15 +165,27 @@ def save_raw_data(df: pd.DataFrame, output_dir: Path = Path("data")) -> Path:
         Zu speichernder Datensatz.
     output_dir : Path
         Zielverzeichnis (wird ggf. angelegt).
+    fmt : str
+        Dateiformat: ``"parquet"`` (Default) oder ``"csv"``.
 
     Returns
     -------
     Path
         Pfad zur gespeicherten Datei.
+
+    Raises
+    ------
+    ValueError
+        Bei unbekanntem Format.
     """
     output_dir.mkdir(parents=True, exist_ok=True)
-    filepath = output_dir / "raw_sensor_data.csv"
-    df.to_csv(filepath, index=False)
+    filepath = output_dir / f"raw_sensor_data.{fmt}"
+    if fmt == "parquet":
+        df.to_parquet(filepath, engine="pyarrow", compression="zstd", index=False)
+    elif fmt == "csv":
+        df.to_csv(filepath, index=False)
+    else:
+        raise ValueError(f"Unbekanntes Dateiformat: {fmt}")
     logger.info("Rohdaten gespeichert: %s", filepath.resolve())
     return filepath
 
@@ -14,6 +14,9 @@ Verwendung
     python main.py                  # Standardlauf (5 000 Samples)
     python main.py --samples 10000  # Mehr Datenpunkte
     python main.py --anomaly-rate 0.08
+    python main.py --format csv     # Roh-/Prozessdaten als CSV statt Parquet
+    python main.py --engine polars  # Pipeline + Scoring als ein Polars-Plan
+    python main.py --no-cache       # Pipeline auch bei unveränderten Rohdaten neu rechnen
 
 Autor : Portfolio-Projekt Predictive Maintenance
 PEP 8 : Ja
@@ -24,8 +27,12 @@ import logging
 from pathlib import Path
 
 from data_generator import generate_sensor_data, save_raw_data
-from pipeline import run_pipeline
-from anomaly_detection import run_anomaly_detection
+from pipeline import collect_to_pandas, lazy_pipeline, run_pipeline, save_processed_data
+from anomaly_detection import (
+    lazy_anomaly_detection,
+    run_anomaly_detection,
+    save_anomaly_scores,
+)
 from visualization import generate_all_plots
 
 # ---------------------------------------------------------------------------
@@ -77,6 +84,23 @@ def parse_args() -> argparse.Namespace:
         default=Path("data"),
         help="Verzeichnis für Roh- und Prozessdaten (Default: data/)",
     )
+    parser.add_argument(
+        "--format",
+        choices=["parquet", "csv"],
+        default="parquet",
+        help="Dateiformat für Roh- und Prozessdaten (Default: parquet)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["pandas", "polars"],
+        default="pandas",
+        help="Ausführung von Pipeline und Anomalieerkennung (Default: pandas)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Verarbeitete Daten eines identischen Vorlaufs nicht wiederverwenden",
+    )
     return parser.parse_args()
 
 
@@ -102,21 +126,30 @@ def main() -> None:
         anomaly_rate=args.anomaly_rate,
         seed=args.seed,
     )
-    save_raw_data(df_raw, args.data_dir)
-
-    # 2. Pipeline (bereinigen + Feature Engineering)
-    logger.info("--- Schritt 2/4: Datenpipeline ---")
-    df_processed = run_pipeline(
-        raw_path=args.data_dir / "raw_sensor_data.csv",
-        output_dir=args.data_dir,
-    )
-
-    # 3. Anomalieerkennung
-    logger.info("--- Schritt 3/4: Anomalieerkennung ---")
-    df_scored = run_anomaly_detection(df_processed)
-    out_path = args.data_dir / "anomaly_scores.csv"
-    df_scored.to_csv(out_path, index=False)
-    logger.info("Anomalie-Scores gespeichert: %s", out_path)
+    raw_path = save_raw_data(df_raw, args.data_dir, args.format)
+
+    if args.engine == "polars":
+        # 2. + 3. als gemeinsamer Lazy-Plan, einmal ausgeführt
+        logger.info("--- Schritt 2-3/4: Datenpipeline + Anomalieerkennung (Polars) ---")
+        lf_processed = lazy_pipeline(raw_path)
+        df_processed, df_scored = collect_to_pandas(
+            lf_processed, lazy_anomaly_detection(lf_processed)
+        )
+        save_processed_data(df_processed, args.data_dir, args.format)
+    else:
+        # 2. Pipeline (bereinigen + Feature Engineering)
+        logger.info("--- Schritt 2/4: Datenpipeline ---")
+        df_processed = run_pipeline(
+            raw_path=raw_path,
+            output_dir=args.data_dir,
+            fmt=args.format,
+            use_cache=not args.no_cache,
+        )
+
+        # 3. Anomalieerkennung
+        logger.info("--- Schritt 3/4: Anomalieerkennung ---")
+        df_scored = run_anomaly_detection(df_processed)
+    save_anomaly_scores(df_scored, args.data_dir, args.format)
 
     # 4. Visualisierungen
     logger.info("--- Schritt 4/4: Visualisierungen ---")
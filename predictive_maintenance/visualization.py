@@ -26,20 +26,49 @@ PEP 8 : Ja
 """
 
 import logging
+import sys
+from io import BytesIO
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 import numpy as np
 import pandas as pd
-import seaborn as sns
+
+from anomaly_detection import FLAG_COMBINED
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
 
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
 # Stil
 # ---------------------------------------------------------------------------
-sns.set_theme(style="darkgrid", palette="muted")
+# matplotlib/seaborn werden erst beim ersten Plot geladen: wer nur die
+# Konstanten (z. B. SENSOR_LABELS) importiert, zahlt den Importaufwand nicht.
+_style_configured = False
+
+
+def _configure_style() -> None:
+    """Wählt das Backend und setzt das Seaborn-Theme (einmalig, beim ersten Plot).
+
+    Plots werden nur als Datei gespeichert: Agg spart die Suche nach einem
+    GUI-Backend. Hat der Aufrufer pyplot bereits geladen (z. B. Notebook),
+    bleibt dessen Backend unangetastet.
+    """
+    global _style_configured
+    if _style_configured:
+        return
+    import matplotlib  # noqa: PLC0415
+
+    if "matplotlib.pyplot" not in sys.modules:
+        matplotlib.use("Agg")
+    import seaborn as sns  # noqa: PLC0415
+
+    sns.set_theme(style="darkgrid", palette="muted")
+    _style_configured = True
+
+
 FIGSIZE_WIDE = (14, 5)
 FIGSIZE_SQUARE = (10, 8)
 
@@ -54,14 +83,17 @@ SENSOR_LABELS: dict[str, str] = {
     "pressure_bar":   "Druck (bar)",
     "cycle_time_s":   "Zykluszeit (s)",
 }
+# Abgeleitete Spaltennamen/Beschriftungen einmalig, in SENSOR_LABELS-Reihenfolge
+ZSCORE_COLS: list[str] = [f"{s}_zscore" for s in SENSOR_LABELS]
+SENSOR_TITLES: list[str] = list(SENSOR_LABELS.values())
 
 
-def _save(fig: plt.Figure, name: str) -> Path:
+def _save(fig: "Figure", name: str) -> Path:
     """Speichert eine Matplotlib-Figure als PNG.
 
     Parameters
     ----------
-    fig : plt.Figure
+    fig : matplotlib.figure.Figure
         Zu speichernde Figure.
     name : str
         Dateiname ohne Erweiterung.
@@ -71,10 +103,18 @@ def _save(fig: plt.Figure, name: str) -> Path:
     Path
         Pfad zur gespeicherten Datei.
     """
+    import matplotlib.pyplot as plt  # noqa: PLC0415
+
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     path = OUTPUT_DIR / f"{name}.png"
-    fig.savefig(path, dpi=150, bbox_inches="tight")
+    # Layout einmal vorab statt bbox_inches="tight" (zusätzlicher Render-
+    # Durchlauf je Datei zum Ausmessen der Ränder)
+    fig.tight_layout()
+    # PNG im Speicher rendern und mit einem einzigen Schreibzugriff ablegen
+    buf = BytesIO()
+    fig.savefig(buf, format="png", dpi=150)
     plt.close(fig)
+    path.write_bytes(buf.getbuffer())
     logger.info("Plot gespeichert: %s", path)
     return path
 
@@ -87,10 +127,11 @@ def plot_timeseries(
     df: pd.DataFrame,
     sensor: str = "temperature_c",
     machine: str = "MED-INJ-01",
+    assume_sorted: bool = False,
 ) -> Path:
     """Zeitreihenverlauf eines Sensors mit markierten Anomalien.
 
-    Anomalien (``anomaly_combined == True``) werden als rote Punkte
+    Anomalien (Bit ``FLAG_COMBINED`` in ``anomaly_flags``) werden als rote Punkte
     dargestellt, Normalwerte als grüne Linie — so ist die Abweichung
     auf einen Blick erkennbar.
 
@@ -102,21 +143,33 @@ def plot_timeseries(
         Zu plottender Sensor (Default: ``temperature_c``).
     machine : str
         Maschinenfilter (Default: ``MED-INJ-01``).
+    assume_sorted : bool
+        ``df`` ist bereits nach ``machine_id``/``timestamp`` sortiert –
+        das Sortieren entfällt.
 
     Returns
     -------
     Path
         Pfad zum gespeicherten Plot.
     """
-    data = df[df["machine_id"] == machine].copy()
-    data.sort_values("timestamp", inplace=True)
+    _configure_style()
+    import matplotlib.dates as mdates  # noqa: PLC0415
+    import matplotlib.pyplot as plt  # noqa: PLC0415
+
+    # Nur die drei benötigten Spalten als Arrays – keine Kopie des Frames
+    rows = np.flatnonzero(df["machine_id"].to_numpy() == machine)
+    if not assume_sorted:
+        rows = rows[np.argsort(df["timestamp"].to_numpy()[rows], kind="stable")]
+    ts = df["timestamp"].to_numpy()[rows]
+    vals = df[sensor].to_numpy()[rows]
+    is_anomaly = (df["anomaly_flags"].to_numpy()[rows] & FLAG_COMBINED) != 0
 
     fig, ax = plt.subplots(figsize=FIGSIZE_WIDE)
 
     # Normalwerte
     ax.plot(
-        data["timestamp"],
-        data[sensor],
+        ts,
+        vals,
         color=NORMAL_COLOR,
         linewidth=0.8,
         alpha=0.85,
@@ -124,14 +177,13 @@ def plot_timeseries(
     )
 
     # Anomalien als Scatter
-    anom = data[data["anomaly_combined"]]
     ax.scatter(
-        anom["timestamp"],
-        anom[sensor],
+        ts[is_anomaly],
+        vals[is_anomaly],
         color=ANOMALY_COLOR,
         zorder=5,
         s=20,
-        label=f"Anomalie (n={len(anom)})",
+        label=f"Anomalie (n={is_anomaly.sum()})",
     )
 
     ax.xaxis.set_major_formatter(mdates.DateFormatter("%d.%m %H:%M"))
@@ -166,9 +218,27 @@ def plot_zscore_heatmap(df: pd.DataFrame) -> Path:
     Path
         Pfad zum gespeicherten Plot.
     """
-    zscore_cols = [f"{s}_zscore" for s in SENSOR_LABELS]
-    pivot = df.groupby("machine_id")[zscore_cols].mean().abs()
-    pivot.columns = [SENSOR_LABELS[c.replace("_zscore", "")] for c in pivot.columns]
+    _configure_style()
+    import matplotlib.pyplot as plt  # noqa: PLC0415
+    import seaborn as sns  # noqa: PLC0415
+
+    # Mittelwerte je Maschine über die Kategorie-Codes (np.bincount) statt
+    # eines groupby-Objekts; Reihenfolge wie groupby: nach Kategorie.
+    machine = df["machine_id"].astype("category")
+    codes = machine.cat.codes.to_numpy()
+    n_machines = len(machine.cat.categories)
+    counts = np.bincount(codes, minlength=n_machines)
+    zscores = df[ZSCORE_COLS].to_numpy(dtype=np.float64)
+    sums = np.column_stack([
+        np.bincount(codes, weights=zscores[:, j], minlength=n_machines)
+        for j in range(len(ZSCORE_COLS))
+    ])
+    seen = counts > 0
+    pivot = pd.DataFrame(
+        np.abs(sums[seen] / counts[seen, None]),
+        index=pd.Index(machine.cat.categories[seen], name="machine_id"),
+        columns=SENSOR_TITLES,
+    )
 
     fig, ax = plt.subplots(figsize=(10, 4))
     sns.heatmap(
@@ -200,25 +270,28 @@ def plot_iqr_boxplots(df: pd.DataFrame) -> Path:
     Parameters
     ----------
     df : pd.DataFrame
-        Datensatz mit ``anomaly_combined``-Spalte.
+        Datensatz mit ``anomaly_flags``-Spalte.
 
     Returns
     -------
     Path
         Pfad zum gespeicherten Plot.
     """
+    _configure_style()
+    import matplotlib.pyplot as plt  # noqa: PLC0415
+    import seaborn as sns  # noqa: PLC0415
+
+    # Statusbeschriftung einmal als Array; Sensorwerte direkt aus der Spalte
+    status = np.where(
+        (df["anomaly_flags"].to_numpy() & FLAG_COMBINED) != 0, "Anomalie", "Normal"
+    )
     fig, axes = plt.subplots(1, len(SENSOR_LABELS), figsize=(16, 5))
 
     for ax, (sensor, label) in zip(axes, SENSOR_LABELS.items()):
-        plot_df = df[["anomaly_combined", sensor]].copy()
-        plot_df["Status"] = plot_df["anomaly_combined"].map(
-            {True: "Anomalie", False: "Normal"}
-        )
         sns.boxplot(
-            data=plot_df,
-            x="Status",
-            y=sensor,
-            hue="Status",
+            x=status,
+            y=df[sensor].to_numpy(),
+            hue=status,
             palette={"Normal": NORMAL_COLOR, "Anomalie": ANOMALY_COLOR},
             legend=False,
             ax=ax,
@@ -228,8 +301,7 @@ def plot_iqr_boxplots(df: pd.DataFrame) -> Path:
         ax.set_xlabel("")
         ax.set_ylabel(label)
 
-    fig.suptitle("Sensorverteilung: Normal vs. Anomalie (IQR-Methode)", y=1.02)
-    fig.tight_layout()
+    fig.suptitle("Sensorverteilung: Normal vs. Anomalie (IQR-Methode)")
 
     return _save(fig, "03_iqr_boxplots")
 
@@ -238,7 +310,7 @@ def plot_iqr_boxplots(df: pd.DataFrame) -> Path:
 # Plot 4 – Kumulative Anomaliezählung
 # ---------------------------------------------------------------------------
 
-def plot_anomaly_timeline(df: pd.DataFrame) -> Path:
+def plot_anomaly_timeline(df: pd.DataFrame, assume_sorted: bool = False) -> Path:
     """Kumulierte Anomaliezählung über die Zeit pro Maschine.
 
     Ein überproportionaler Anstieg der Kurvensteigung kann auf
@@ -248,19 +320,31 @@ def plot_anomaly_timeline(df: pd.DataFrame) -> Path:
     Parameters
     ----------
     df : pd.DataFrame
-        Datensatz mit ``anomaly_combined``-Spalte.
+        Datensatz mit ``anomaly_flags``-Spalte.
+    assume_sorted : bool
+        ``df`` ist bereits nach ``machine_id``/``timestamp`` sortiert –
+        das Sortieren entfällt.
 
     Returns
     -------
     Path
         Pfad zum gespeicherten Plot.
     """
+    _configure_style()
+    import matplotlib.dates as mdates  # noqa: PLC0415
+    import matplotlib.pyplot as plt  # noqa: PLC0415
+
+    # Einmal sortieren und kumulieren; die Schleife zeichnet nur noch
+    data = df[["machine_id", "timestamp", "anomaly_flags"]]
+    if not assume_sorted:
+        data = data.sort_values(["machine_id", "timestamp"])
+    is_anomaly = (data["anomaly_flags"] & FLAG_COMBINED) != 0
+    cumsum = is_anomaly.groupby(data["machine_id"], observed=True, sort=False).cumsum()
+
     fig, ax = plt.subplots(figsize=FIGSIZE_WIDE)
 
-    for machine, grp in df.groupby("machine_id"):
-        grp = grp.sort_values("timestamp")
-        cumsum = grp["anomaly_combined"].cumsum()
-        ax.plot(grp["timestamp"], cumsum, label=machine, linewidth=1.5)
+    for machine, rows in data.groupby("machine_id", observed=True).indices.items():
+        ax.plot(data["timestamp"].iloc[rows], cumsum.iloc[rows], label=machine, linewidth=1.5)
 
     ax.xaxis.set_major_formatter(mdates.DateFormatter("%d.%m"))
     fig.autofmt_xdate()
@@ -293,8 +377,21 @@ def plot_correlation_matrix(df: pd.DataFrame) -> Path:
     Path
         Pfad zum gespeicherten Plot.
     """
-    corr_df = df[list(SENSOR_LABELS.keys())].rename(columns=SENSOR_LABELS)
-    corr = corr_df.corr()
+    _configure_style()
+    import matplotlib.pyplot as plt  # noqa: PLC0415
+    import seaborn as sns  # noqa: PLC0415
+
+    # Nur zur Anzeige (Annotation mit zwei Nachkommastellen): float32 genügt
+    # und halbiert den Speicherdurchsatz; die Sensorspalten sind nach der
+    # Pipeline ohnehin float32, die Konvertierung ist dann kopierfrei.
+    values = df[list(SENSOR_LABELS)].to_numpy(dtype=np.float32)
+    if np.isnan(values).any():
+        # Lücken: paarweise Auswertung wie pandas
+        corr = pd.DataFrame(values).corr().to_numpy()
+    else:
+        # Vollständiger Block: eine Kovarianz-Berechnung für alle Paare
+        corr = np.corrcoef(values, rowvar=False, dtype=np.float32)
+    corr = pd.DataFrame(corr, index=SENSOR_TITLES, columns=SENSOR_TITLES)
 
     mask = np.triu(np.ones_like(corr, dtype=bool))
     fig, ax = plt.subplots(figsize=FIGSIZE_SQUARE)
@@ -331,13 +428,20 @@ def generate_all_plots(df: pd.DataFrame) -> list[Path]:
     list[Path]
         Liste aller erzeugten Plot-Dateien.
     """
-    paths = [
-        plot_timeseries(df),
-        plot_zscore_heatmap(df),
-        plot_iqr_boxplots(df),
-        plot_anomaly_timeline(df),
-        plot_correlation_matrix(df),
-    ]
+    _configure_style()
+    import matplotlib.pyplot as plt  # noqa: PLC0415
+
+    # Einmal sortieren statt je Zeitreihen-Plot; die übrigen Plots sind
+    # von der Zeilenreihenfolge unabhängig
+    df = df.sort_values(["machine_id", "timestamp"], kind="stable")
+    with plt.ioff():
+        paths = [
+            plot_timeseries(df, assume_sorted=True),
+            plot_zscore_heatmap(df),
+            plot_iqr_boxplots(df),
+            plot_anomaly_timeline(df, assume_sorted=True),
+            plot_correlation_matrix(df),
+        ]
     logger.info("%d Plots erzeugt.", len(paths))
     return paths
 
@@ -3,12 +3,13 @@ Synthetischer Datengenerator für das Sales Dashboard.
 Erstellt realistische Testdaten für Produkte, Kunden und Verkäufe.
 """
 
-import random
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 
-from database import get_connection, init_db, DB_PATH
+import numpy as np
+
+from database import get_connection, init_db, DB_PATH, INSERT_SALES_SQL
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +26,9 @@ PRODUCTS = [
     ("Lizenz Multi-User",     "Lizenz",    599.00),
 ]
 
+# Zeilen je Transaktion beim Einfügen großer Verkaufsmengen
+SALES_CHUNK_SIZE = 10_000
+
 CUSTOMERS = [
     ("Alpha GmbH",        "Nord",  "B2B"),
     ("Beta AG",           "Süd",   "B2B"),
@@ -39,31 +43,31 @@ CUSTOMERS = [
 ]
 
 
-def seed_master_data(db_path: Path = DB_PATH) -> tuple[list[int], list[int]]:
-    """Fügt Stammdaten (Produkte, Kunden) ein falls noch nicht vorhanden."""
+def seed_master_data(db_path: Path = DB_PATH) -> tuple[dict[int, float], list[int]]:
+    """
+    Fügt Stammdaten (Produkte, Kunden) ein falls noch nicht vorhanden.
+
+    Returns
+    -------
+    tuple[dict[int, float], list[int]]
+        Stückpreise je Produkt-ID und die Kunden-IDs.
+    """
     with get_connection(db_path) as conn:
-        if conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] > 0:
-            product_ids = [r[0] for r in conn.execute("SELECT id FROM products").fetchall()]
-            customer_ids = [r[0] for r in conn.execute("SELECT id FROM customers").fetchall()]
-            return product_ids, customer_ids
-
-        product_ids, customer_ids = [], []
-        for name, category, price in PRODUCTS:
-            cur = conn.execute(
-                "INSERT INTO products (name, category, unit_price) VALUES (?, ?, ?)",
-                (name, category, price)
+        seeded = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] > 0
+        if not seeded:
+            # Ein vorbereitetes Statement, alle Zeilen gebunden – IDs danach per SELECT
+            conn.executemany(
+                "INSERT INTO products (name, category, unit_price) VALUES (?, ?, ?)", PRODUCTS
             )
-            product_ids.append(cur.lastrowid)
-
-        for name, region, segment in CUSTOMERS:
-            cur = conn.execute(
-                "INSERT INTO customers (name, region, segment) VALUES (?, ?, ?)",
-                (name, region, segment)
+            conn.executemany(
+                "INSERT INTO customers (name, region, segment) VALUES (?, ?, ?)", CUSTOMERS
             )
-            customer_ids.append(cur.lastrowid)
+        prices = dict(conn.execute("SELECT id, unit_price FROM products ORDER BY id").fetchall())
+        customer_ids = [r[0] for r in conn.execute("SELECT id FROM customers ORDER BY id")]
 
-    logger.info("Stammdaten eingefügt: %d Produkte, %d Kunden", len(product_ids), len(customer_ids))
-    return product_ids, customer_ids
+    if not seeded:
+        logger.info("Stammdaten eingefügt: %d Produkte, %d Kunden", len(prices), len(customer_ids))
+    return prices, customer_ids
 
 
 def generate_sales(
@@ -75,6 +79,9 @@ def generate_sales(
     """
     Generiert synthetische Verkaufsdaten mit saisonalen Schwankungen.
 
+    Alle Zufallswerte werden als NumPy-Arrays der Länge ``n`` in einem
+    Durchgang gezogen, Umsätze spaltenweise berechnet.
+
     Parameters
     ----------
     n : int
@@ -91,51 +98,45 @@ def generate_sales(
     int
         Anzahl eingefügter Datensätze.
     """
-    random.seed(seed)
+    rng = np.random.default_rng(seed)
     if start_date is None:
         start_date = datetime(2024, 1, 1)
 
-    product_ids, customer_ids = seed_master_data(db_path)
-
+    prices, customer_ids = seed_master_data(db_path)
+    product_ids = list(prices)
+
+    sale_dates = np.datetime64(start_date.date()) + rng.integers(0, 365, n).astype("timedelta64[D]")
+    product_idx = rng.integers(0, len(product_ids), n)
+    customer_idx = rng.integers(0, len(customer_ids), n)
+    quantity = rng.choice([1, 2, 3, 5, 10], size=n, p=[0.50, 0.25, 0.15, 0.07, 0.03])
+    discount = rng.choice([0.0, 0.05, 0.10, 0.15, 0.20], size=n, p=[0.40, 0.25, 0.20, 0.10, 0.05])
+
+    # Saisonalität: Q4 (Okt–Dez) verkauft ~40% mehr
+    month = sale_dates.astype("datetime64[M]").astype(int) % 12 + 1
+    seasonal_boost = np.where(month >= 10, 1.4, 1.0)
+
+    unit_prices = np.array(list(prices.values()))
+    revenue = np.round(unit_prices[product_idx] * quantity * seasonal_boost * (1 - discount), 2)
+
+    columns = (
+        np.datetime_as_string(sale_dates, unit="D"),
+        np.asarray(product_ids)[product_idx],
+        np.asarray(customer_ids)[customer_idx],
+        quantity,
+        discount,
+        revenue,
+    )
+
+    # Eine Transaktion je Block: Journal und Zeilentupel bleiben auch bei
+    # sehr großen n begrenzt. sqlite3 bindet nur Python-Skalare (.tolist()).
     with get_connection(db_path) as conn:
-        prices = {
-            row[0]: row[1]
-            for row in conn.execute("SELECT id, unit_price FROM products").fetchall()
-        }
-
-    records = []
-    for _ in range(n):
-        # Saisonalität: Q4 (Okt–Dez) verkauft ~40% mehr
-        day_offset = random.randint(0, 364)
-        sale_date = start_date + timedelta(days=day_offset)
-        seasonal_boost = 1.4 if sale_date.month in (10, 11, 12) else 1.0
-
-        product_id = random.choice(product_ids)
-        customer_id = random.choice(customer_ids)
-        quantity = random.choices([1, 2, 3, 5, 10], weights=[50, 25, 15, 7, 3])[0]
-        discount = random.choices([0.0, 0.05, 0.10, 0.15, 0.20], weights=[40, 25, 20, 10, 5])[0]
-
-        base_revenue = prices[product_id] * quantity * seasonal_boost
-        revenue = round(base_revenue * (1 - discount), 2)
-
-        records.append({
-            "sale_date": sale_date.strftime("%Y-%m-%d"),
-            "product_id": product_id,
-            "customer_id": customer_id,
-            "quantity": quantity,
-            "discount": discount,
-            "revenue": revenue,
-        })
+        for start in range(0, n, SALES_CHUNK_SIZE):
+            block = slice(start, start + SALES_CHUNK_SIZE)
+            with conn:
+                conn.executemany(INSERT_SALES_SQL, zip(*(col[block].tolist() for col in columns)))
 
-    with get_connection(db_path) as conn:
-        conn.executemany(
-            "INSERT INTO sales (sale_date, product_id, customer_id, quantity, discount, revenue) "
-            "VALUES (:sale_date, :product_id, :customer_id, :quantity, :discount, :revenue)",
-            records
-        )
-
-    logger.info("%d Verkaufsdatensätze generiert.", len(records))
-    return len(records)
+    logger.info("%d Verkaufsdatensätze generiert.", n)
+    return n
 
 
 def setup_demo_db(db_path: Path = DB_PATH) -> None:
@@ -5,9 +5,13 @@ Unterstützt SQLite (Standard) und MongoDB (optional, via pymongo).
 
 import sqlite3
 import logging
+from operator import itemgetter
 from pathlib import Path
 from datetime import datetime, date
 from contextlib import contextmanager
+from functools import cache
+
+import pandas as pd
 
 logger = logging.getLogger(__name__)
 
@@ -41,21 +45,59 @@ CREATE TABLE IF NOT EXISTS sales (
     customer_id  INTEGER REFERENCES customers(id),
     quantity     INTEGER NOT NULL,
     discount     REAL    DEFAULT 0.0,
-    revenue      REAL    NOT NULL
+    revenue      REAL    NOT NULL,
+    -- Abgeleiteter Monat (YYYY-MM) für Monatsauswertungen ohne strftime je Zeile
+    sale_year_month TEXT GENERATED ALWAYS AS (substr(sale_date, 1, 7)) VIRTUAL
 );
 
 CREATE INDEX IF NOT EXISTS idx_sales_date     ON sales(sale_date);
 CREATE INDEX IF NOT EXISTS idx_sales_product  ON sales(product_id);
 CREATE INDEX IF NOT EXISTS idx_sales_customer ON sales(customer_id);
+-- Index für query_sales_summary: Monat, Join-Schlüssel und die aggregierten
+-- Spalten – gruppiert wird in Indexreihenfolge über den gespeicherten Monat
+CREATE INDEX IF NOT EXISTS idx_sales_year_month
+    ON sales(sale_year_month, product_id, revenue, discount);
 """
 
+# Positionale Parameter: sqlite3 muss je Zeile keine Dict-Schlüssel auflösen
+SALES_FIELDS = ("sale_date", "product_id", "customer_id", "quantity", "discount", "revenue")
+INSERT_SALES_SQL = (
+    f"INSERT INTO sales ({', '.join(SALES_FIELDS)}) "
+    f"VALUES ({', '.join('?' * len(SALES_FIELDS))})"
+)
+
+
+# Verbindungseinstellungen: WAL + synchronous=NORMAL sparen beim Bulk-Insert
+# den fsync je Transaktion, größerer Cache/mmap beschleunigt Aggregationen.
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",     # 64 MiB
+    "PRAGMA mmap_size = 268435456",   # 256 MiB
+)
+
 
 @contextmanager
-def get_connection(db_path: Path = DB_PATH):
-    """Kontextmanager für SQLite-Verbindungen mit automatischem Commit/Rollback."""
-    conn = sqlite3.connect(db_path)
+def get_connection(db_path: Path = DB_PATH, readonly: bool = False):
+    """
+    Kontextmanager für SQLite-Verbindungen mit automatischem Commit/Rollback.
+
+    Parameters
+    ----------
+    db_path : Path
+        Pfad zur SQLite-Datenbank.
+    readonly : bool
+        Nur lesend öffnen (``mode=ro``) – für reine Abfragen, ohne Schreibsperre.
+    """
+    if readonly:
+        conn = sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode = WAL")
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     try:
         yield conn
         conn.commit()
@@ -69,6 +111,14 @@ def get_connection(db_path: Path = DB_PATH):
 def init_db(db_path: Path = DB_PATH) -> None:
     """Erstellt das Datenbankschema falls noch nicht vorhanden."""
     with get_connection(db_path) as conn:
+        # Bestehende Datenbanken ohne Monatsspalte nachrüsten (VIRTUAL erlaubt
+        # ALTER TABLE), bevor das Schema den Index darauf anlegt
+        sales_cols = {r[1] for r in conn.execute("PRAGMA table_xinfo(sales)")}
+        if sales_cols and "sale_year_month" not in sales_cols:
+            conn.execute(
+                "ALTER TABLE sales ADD COLUMN sale_year_month TEXT "
+                "GENERATED ALWAYS AS (substr(sale_date, 1, 7)) VIRTUAL"
+            )
         conn.executescript(SCHEMA_SQL)
     logger.info("Datenbank initialisiert: %s", db_path)
 
@@ -90,64 +140,174 @@ def insert_sales_batch(records: list[dict], db_path: Path = DB_PATH) -> int:
     int
         Anzahl eingefügter Datensätze.
     """
-    sql = """
-    INSERT INTO sales (sale_date, product_id, customer_id, quantity, discount, revenue)
-    VALUES (:sale_date, :product_id, :customer_id, :quantity, :discount, :revenue)
-    """
     with get_connection(db_path) as conn:
-        conn.executemany(sql, records)
+        conn.executemany(INSERT_SALES_SQL, map(itemgetter(*SALES_FIELDS), records))
     logger.info("%d Verkaufsdatensätze eingefügt.", len(records))
     return len(records)
 
 
-def query_sales_summary(db_path: Path = DB_PATH) -> list[dict]:
+def _run_query(
+    sql: str, params: tuple = (), db_path: Path = DB_PATH, as_frame: bool = False
+) -> list[dict] | pd.DataFrame:
+    """
+    Führt eine Leseabfrage aus – als Liste von Dicts oder direkt als DataFrame.
+
+    Für ``as_frame=True`` werden die Zeilen als einfache Tupel geholt und
+    zusammen mit ``cursor.description`` an pandas übergeben, ohne den Umweg
+    über ``sqlite3.Row`` und ein Dict je Zeile.
+    """
+    with get_connection(db_path, readonly=True) as conn:
+        cur = conn.cursor()
+        if as_frame:
+            cur.row_factory = None
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        if as_frame:
+            return pd.DataFrame(rows, columns=[d[0] for d in cur.description])
+    return [dict(r) for r in rows]
+
+
+SALES_SUMMARY_SQL = """
+SELECT
+    s.sale_year_month               AS month,
+    p.category,
+    SUM(s.revenue)                  AS total_revenue,
+    COUNT(s.id)                     AS total_sales,
+    AVG(s.discount)                 AS avg_discount
+FROM sales s
+JOIN products p ON s.product_id = p.id
+GROUP BY s.sale_year_month, p.category
+ORDER BY s.sale_year_month
+"""
+
+
+# Gleiche Auswertung für DuckDB über die angehängte SQLite-Datei (Schema "db");
+# der Monat wird aus sale_date gebildet, da der SQLite-Scanner generierte
+# Spalten nicht zwingend mitliest.
+DUCKDB_SALES_SUMMARY_SQL = """
+SELECT
+    substr(s.sale_date, 1, 7)       AS month,
+    p.category,
+    SUM(s.revenue)                  AS total_revenue,
+    COUNT(s.id)                     AS total_sales,
+    AVG(s.discount)                 AS avg_discount
+FROM db.sales s
+JOIN db.products p ON s.product_id = p.id
+GROUP BY month, p.category
+ORDER BY month, p.category
+"""
+
+
+@cache
+def _duckdb_sqlite_ready() -> bool:
+    """
+    Stellt die DuckDB-Erweiterung sqlite einmal je Prozess bereit.
+
+    Lädt die lokal installierte Erweiterung; nur wenn das fehlschlägt, wird
+    sie installiert (Download). Das Ergebnis wird gecacht – auch ein
+    Fehlschlag, damit nicht jede Abfrage erneut das Netz bemüht.
+    """
+    import duckdb
+
+    con = duckdb.connect()
+    try:
+        try:
+            con.load_extension("sqlite")
+        except duckdb.Error:
+            con.install_extension("sqlite")
+            con.load_extension("sqlite")
+        return True
+    except duckdb.Error as e:
+        logger.warning("DuckDB-Erweiterung sqlite nicht verfügbar (%s).", e)
+        return False
+    finally:
+        con.close()
+
+
+def _run_duckdb_query(sql: str, db_path: Path = DB_PATH) -> pd.DataFrame | None:
+    """
+    Führt eine Abfrage mit DuckDB über die SQLite-Datenbank aus.
+    Benötigt: pip install duckdb
+
+    Returns
+    -------
+    pd.DataFrame | None
+        Ergebnis, oder ``None`` wenn duckdb nicht installiert oder die
+        sqlite-Erweiterung nicht verfügbar ist.
+    """
+    try:
+        import duckdb
+    except ImportError:
+        logger.warning("duckdb nicht installiert – Abfrage läuft über SQLite.")
+        return None
+    if not _duckdb_sqlite_ready():
+        return None
+    con = duckdb.connect()
+    try:
+        con.load_extension("sqlite")
+        path = Path(db_path).as_posix().replace("'", "''")
+        con.execute(f"ATTACH '{path}' AS db (TYPE SQLITE, READ_ONLY)")
+        return con.execute(sql).fetchdf()
+    except duckdb.Error as e:
+        logger.warning("DuckDB-Abfrage fehlgeschlagen (%s) – Abfrage läuft über SQLite.", e)
+        return None
+    finally:
+        con.close()
+
+
+def query_sales_summary(
+    db_path: Path = DB_PATH, as_frame: bool = False, engine: str = "sqlite"
+) -> list[dict] | pd.DataFrame:
     """
     Aggregierte Umsatzübersicht: Monat, Kategorie, Umsatz, Verkäufe.
 
+    Parameters
+    ----------
+    db_path : Path
+        Pfad zur SQLite-Datenbank.
+    as_frame : bool
+        Ergebnis als DataFrame statt als Liste von Dicts.
+    engine : str
+        ``"sqlite"`` (Standard) oder ``"duckdb"`` – vektorisierte Aggregation
+        über dieselbe Datei für große Verkaufstabellen (optional, fällt ohne
+        installiertes duckdb auf SQLite zurück).
+
     Returns
     -------
-    list[dict]
+    list[dict] | pd.DataFrame
         Aggregierte Zeilen sortiert nach Monat.
     """
-    sql = """
-    SELECT
-        strftime('%Y-%m', s.sale_date)  AS month,
-        p.category,
-        SUM(s.revenue)                  AS total_revenue,
-        COUNT(s.id)                     AS total_sales,
-        AVG(s.discount)                 AS avg_discount
-    FROM sales s
-    JOIN products p ON s.product_id = p.id
-    GROUP BY month, p.category
-    ORDER BY month
-    """
-    with get_connection(db_path) as conn:
-        rows = conn.execute(sql).fetchall()
-    return [dict(r) for r in rows]
+    if engine not in ("sqlite", "duckdb"):
+        raise ValueError(f"Unbekannte Engine: {engine!r} (erwartet 'sqlite' oder 'duckdb')")
+    if engine == "duckdb":
+        df = _run_duckdb_query(DUCKDB_SALES_SUMMARY_SQL, db_path)
+        if df is not None:
+            return df if as_frame else df.to_dict("records")
+    return _run_query(SALES_SUMMARY_SQL, db_path=db_path, as_frame=as_frame)
 
 
-def query_top_products(limit: int = 10, db_path: Path = DB_PATH) -> list[dict]:
-    """Top-Produkte nach Umsatz."""
+def query_top_products(
+    limit: int = 10, db_path: Path = DB_PATH, as_frame: bool = False
+) -> list[dict] | pd.DataFrame:
+    """Top-Produkte nach Umsatz (``as_frame=True``: als DataFrame)."""
     sql = """
     SELECT p.name, p.category, SUM(s.revenue) AS total_revenue, SUM(s.quantity) AS units_sold
     FROM sales s JOIN products p ON s.product_id = p.id
     GROUP BY p.id ORDER BY total_revenue DESC LIMIT ?
     """
-    with get_connection(db_path) as conn:
-        rows = conn.execute(sql, (limit,)).fetchall()
-    return [dict(r) for r in rows]
+    return _run_query(sql, (limit,), db_path, as_frame)
 
 
-def query_regional_performance(db_path: Path = DB_PATH) -> list[dict]:
-    """Umsatz nach Region und Kundensegment."""
+def query_regional_performance(
+    db_path: Path = DB_PATH, as_frame: bool = False
+) -> list[dict] | pd.DataFrame:
+    """Umsatz nach Region und Kundensegment (``as_frame=True``: als DataFrame)."""
     sql = """
     SELECT c.region, c.segment, SUM(s.revenue) AS total_revenue, COUNT(DISTINCT c.id) AS customers
     FROM sales s JOIN customers c ON s.customer_id = c.id
     GROUP BY c.region, c.segment ORDER BY total_revenue DESC
     """
-    with get_connection(db_path) as conn:
-        rows = conn.execute(sql).fetchall()
-    return [dict(r) for r in rows]
+    return _run_query(sql, db_path=db_path, as_frame=as_frame)
 
 
 # ---------------------------------------------------------------------------
@@ -1,11 +1,20 @@
 """
 Report-Export für Sales Dashboard.
-Exportiert aggregierte Auswertungen als CSV und Excel.
+Exportiert aggregierte Auswertungen als CSV und Excel, Rohdaten zusätzlich als Parquet.
+
+Laufzeit: Der Export ist durch Speicher und Objekt-Erzeugung begrenzt (Zeilen
+aus SQLite, Zellen für openpyxl), nicht durch Rechenleistung – Cython/Numba
+bringen hier nichts. Gewonnen wird über die Datenwege: blockweises Lesen
+(``RAW_CHUNK_SIZE``), Write-only-Workbook, gepuffertes CSV und in ``main``
+einmal abgefragte, gemeinsam genutzte Auswertungen.
 """
 
+import csv
 import logging
+from collections.abc import Iterable
 from datetime import datetime
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import pandas as pd
 
@@ -15,58 +24,166 @@ from database import (
     query_regional_performance,
     get_connection,
     DB_PATH,
+    SALES_SUMMARY_SQL,
 )
 
+if TYPE_CHECKING:
+    from openpyxl import Workbook
+
 logger = logging.getLogger(__name__)
 EXPORT_DIR = Path("docs")
 EXPORT_DIR.mkdir(exist_ok=True)
 
+# Rohdaten (alle Verkäufe mit Produkt- und Kundenangaben) für Excel/Parquet
+RAW_SALES_SQL = """
+SELECT s.sale_date, p.name AS product, p.category, c.name AS customer,
+       c.region, c.segment, s.quantity, s.discount, s.revenue
+FROM sales s
+JOIN products p ON s.product_id = p.id
+JOIN customers c ON s.customer_id = c.id
+ORDER BY s.sale_date
+"""
+# Zeilen je Block beim Schreiben der Rohdaten
+RAW_CHUNK_SIZE = 10_000
+# Schreibpuffer für CSV-Dateien (1 MiB statt 8 KiB): weniger write()-Aufrufe
+CSV_BUFFER_SIZE = 1 << 20
+
 
-def export_csv(db_path: Path = DB_PATH) -> Path:
-    """Exportiert alle Kerndaten als CSV-Datei."""
-    summary = pd.DataFrame(query_sales_summary(db_path))
+def export_csv(db_path: Path = DB_PATH, summary: pd.DataFrame | None = None) -> Path:
+    """Exportiert alle Kerndaten als CSV-Datei.
+
+    Ohne ``summary`` gehen die Zeilen als Tupel direkt vom Cursor an
+    ``csv.writer`` – ohne Umweg über einen DataFrame. Eine bereits geladene
+    Monatsauswertung (``query_sales_summary(as_frame=True)``) wird ohne
+    erneute Abfrage geschrieben.
+    """
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     path = EXPORT_DIR / f"sales_summary_{ts}.csv"
-    summary.to_csv(path, index=False, sep=";", encoding="utf-8-sig")
+    with open(path, "w", newline="", encoding="utf-8-sig", buffering=CSV_BUFFER_SIZE) as f:
+        writer = csv.writer(f, delimiter=";", lineterminator="\n")
+        if summary is not None:
+            writer.writerow(summary.columns)
+            writer.writerows(summary.itertuples(index=False, name=None))
+        else:
+            with get_connection(db_path, readonly=True) as conn:
+                cur = conn.cursor()
+                cur.row_factory = None
+                cur.execute(SALES_SUMMARY_SQL)
+                writer.writerow(d[0] for d in cur.description)
+                writer.writerows(cur)
     logger.info("CSV-Export: %s", path)
     return path
 
 
-def export_excel(db_path: Path = DB_PATH) -> Path:
+def _column_widths(df: pd.DataFrame) -> list[int]:
+    """Spaltenbreite je Spalte: längster Eintrag inkl. Überschrift + 3, maximal 40.
+
+    Die Längen werden spaltenweise vektorisiert über ``str.len()`` bestimmt,
+    nicht Zelle für Zelle.
+    """
+    widths = []
+    for col in df.columns:
+        longest = int(df[col].astype(str).str.len().max()) if len(df) else 0
+        widths.append(min(max(len(str(col)), longest) + 3, 40))
+    return widths
+
+
+def _write_sheet(wb: "Workbook", name: str, chunks: Iterable[pd.DataFrame]) -> None:
+    """
+    Hängt ein Tabellenblatt an und schreibt die DataFrame-Blöcke zeilenweise.
+
+    Spaltenbreiten und Überschrift kommen aus dem ersten Block – im
+    Write-only-Modus lassen sich geschriebene Zellen nicht mehr lesen.
+    """
+    from openpyxl.utils import get_column_letter
+
+    ws = wb.create_sheet(name)
+    for i, df in enumerate(chunks):
+        if i == 0:
+            for col, width in enumerate(_column_widths(df), start=1):
+                ws.column_dimensions[get_column_letter(col)].width = width
+            ws.append(list(df.columns))
+        for row in df.itertuples(index=False, name=None):
+            ws.append(row)
+
+
+def export_excel(
+    db_path: Path = DB_PATH,
+    summary: pd.DataFrame | None = None,
+    products: pd.DataFrame | None = None,
+    regional: pd.DataFrame | None = None,
+) -> Path:
     """
     Exportiert einen mehrseitigen Excel-Report.
     Enthält: Monatsumsatz, Top-Produkte, Regionale Performance, Rohdaten.
+
+    Bereits geladene Auswertungen (``summary``, ``products`` = Top 10,
+    ``regional``) werden übernommen, fehlende hier abgefragt.
     """
+    # openpyxl erst hier laden: CSV-/Parquet-Export kommen ohne aus
+    from openpyxl import Workbook
+
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     path = EXPORT_DIR / f"sales_report_{ts}.xlsx"
 
-    summary_df = pd.DataFrame(query_sales_summary(db_path))
-    products_df = pd.DataFrame(query_top_products(limit=10, db_path=db_path))
-    regional_df = pd.DataFrame(query_regional_performance(db_path))
-
-    sql_raw = """
-    SELECT s.sale_date, p.name AS product, p.category, c.name AS customer,
-           c.region, c.segment, s.quantity, s.discount, s.revenue
-    FROM sales s
-    JOIN products p ON s.product_id = p.id
-    JOIN customers c ON s.customer_id = c.id
-    ORDER BY s.sale_date
-    """
-    with get_connection(db_path) as conn:
-        raw_df = pd.read_sql_query(sql_raw, conn)
-
-    with pd.ExcelWriter(path, engine="openpyxl") as writer:
-        summary_df.to_excel(writer, sheet_name="Monatsumsatz", index=False)
-        products_df.to_excel(writer, sheet_name="Top Produkte", index=False)
-        regional_df.to_excel(writer, sheet_name="Regionale Performance", index=False)
-        raw_df.to_excel(writer, sheet_name="Rohdaten", index=False)
-
-        # Spaltenbreiten automatisch anpassen
-        for sheet_name in writer.sheets:
-            ws = writer.sheets[sheet_name]
-            for col in ws.columns:
-                max_len = max(len(str(cell.value or "")) for cell in col) + 3
-                ws.column_dimensions[col[0].column_letter].width = min(max_len, 40)
+    # Write-only-Workbook: Zeilen werden direkt serialisiert statt als
+    # Zell-Objekte im Speicher gehalten
+    wb = Workbook(write_only=True)
+    if summary is None:
+        summary = query_sales_summary(db_path, as_frame=True)
+    if products is None:
+        products = query_top_products(limit=10, db_path=db_path, as_frame=True)
+    if regional is None:
+        regional = query_regional_performance(db_path, as_frame=True)
+    _write_sheet(wb, "Monatsumsatz", [summary])
+    _write_sheet(wb, "Top Produkte", [products])
+    _write_sheet(wb, "Regionale Performance", [regional])
+
+    # Rohdaten blockweise vom Cursor ins Blatt – im Speicher liegt nie mehr
+    # als ein Block des Joins
+    with get_connection(db_path, readonly=True) as conn:
+        _write_sheet(wb, "Rohdaten", pd.read_sql_query(RAW_SALES_SQL, conn, chunksize=RAW_CHUNK_SIZE))
+    wb.save(path)
 
     logger.info("Excel-Report: %s", path)
     return path
+
+
+def export_parquet(db_path: Path = DB_PATH) -> Path | None:
+    """
+    Exportiert die Rohdaten zusätzlich als Parquet-Datei (Snappy).
+    Benötigt: pip install pyarrow
+
+    Für die Weiterverarbeitung deutlich kleiner und schneller einzulesen als
+    CSV/XLSX. Die Blöcke des Joins werden nacheinander als Row Groups
+    geschrieben.
+
+    Returns
+    -------
+    Path | None
+        Pfad zur Datei, oder ``None`` wenn pyarrow nicht installiert ist.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        logger.warning("pyarrow nicht installiert – Parquet-Export übersprungen.")
+        return None
+
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = EXPORT_DIR / f"sales_raw_{ts}.parquet"
+    writer = None
+    try:
+        with get_connection(db_path, readonly=True) as conn:
+            for chunk in pd.read_sql_query(RAW_SALES_SQL, conn, chunksize=RAW_CHUNK_SIZE):
+                schema = writer.schema if writer is not None else None
+                table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression="snappy")
+                writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    logger.info("Parquet-Export: %s", path)
+    return path
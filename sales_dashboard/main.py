@@ -45,20 +45,29 @@ def main() -> None:
         else:
             logger.info("Datenbank enthält %d Datensätze – kein Re-Seed.", count)
 
+    # Auswertungen einmal abfragen, von Plots und Exporten gemeinsam genutzt
+    from database import query_sales_summary, query_top_products, query_regional_performance
+    summary  = query_sales_summary(as_frame=True)
+    products = query_top_products(limit=10, as_frame=True)
+    regional = query_regional_performance(as_frame=True)
+
     if not args.no_plots:
         from visualizations import generate_all_plots
-        paths = generate_all_plots()
+        paths = generate_all_plots(summary=summary, products=products, regional=regional)
         for p in paths:
             logger.info("  Plot: %s", p)
 
-    from exporter import export_csv, export_excel
-    csv_path   = export_csv()
-    excel_path = export_excel()
+    from exporter import export_csv, export_excel, export_parquet
+    csv_path     = export_csv(summary=summary)
+    excel_path   = export_excel(summary=summary, products=products, regional=regional)
+    parquet_path = export_parquet()
 
     logger.info("-" * 55)
     logger.info("  ✓ Dashboard abgeschlossen")
     logger.info("  CSV  : %s", csv_path)
     logger.info("  Excel: %s", excel_path)
+    if parquet_path is not None:
+        logger.info("  Parquet: %s", parquet_path)
     logger.info("=" * 55)
 
 
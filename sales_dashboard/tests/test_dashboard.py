@@ -3,6 +3,7 @@ Unit-Tests für Sales Dashboard.
 Ausführen: pytest tests/test_dashboard.py -v
 """
 
+import sqlite3
 import sys
 import tempfile
 from pathlib import Path
@@ -12,7 +13,10 @@ import pytest
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from database import init_db, get_connection, query_sales_summary, query_top_products, query_regional_performance
+from database import (
+    init_db, get_connection, insert_sales_batch, SALES_SUMMARY_SQL,
+    query_sales_summary, query_top_products, query_regional_performance,
+)
 from data_seeder import seed_master_data, generate_sales
 
 
@@ -20,16 +24,40 @@ from data_seeder import seed_master_data, generate_sales
 # Fixtures
 # ---------------------------------------------------------------------------
 
-@pytest.fixture
-def temp_db(tmp_path):
-    """Temporäre SQLite-Datenbank für jeden Test."""
-    db_path = tmp_path / "test_sales.db"
+@pytest.fixture(scope="session")
+def temp_db(tmp_path_factory):
+    """Temporäre SQLite-Datenbank, einmal je Testlauf befüllt.
+
+    Die Tests lesen nur; schreibende Tests legen eine eigene Datenbank an.
+    """
+    db_path = tmp_path_factory.mktemp("db") / "test_sales.db"
     init_db(db_path)
     seed_master_data(db_path)
     generate_sales(n=200, seed=99, db_path=db_path)
     return db_path
 
 
+def _db_stats(db_path):
+    """Kennzahlen für die Smoke-Tests in einer einzigen Abfrage."""
+    with get_connection(db_path) as conn:
+        row = conn.execute("""
+            SELECT (SELECT COUNT(*) FROM products)  AS products,
+                   (SELECT COUNT(*) FROM customers) AS customers,
+                   COUNT(*)                         AS sales,
+                   MIN(revenue)                     AS min_revenue,
+                   MIN(discount)                    AS min_discount,
+                   MAX(discount)                    AS max_discount
+            FROM sales
+        """).fetchone()
+    return dict(row)
+
+
+@pytest.fixture(scope="session")
+def stats(temp_db):
+    """Zähler und Wertebereiche der Testdatenbank."""
+    return _db_stats(temp_db)
+
+
 # ---------------------------------------------------------------------------
 # Datenbankschema
 # ---------------------------------------------------------------------------
@@ -43,44 +71,71 @@ def test_schema_tables_exist(temp_db):
     assert {"products", "customers", "sales"}.issubset(tables)
 
 
-def test_products_seeded(temp_db):
-    """Stammdaten: mind. 10 Produkte vorhanden."""
+def test_connection_pragmas(temp_db):
+    """Schreibverbindungen laufen im WAL-Modus, Lesezugriffe nur lesend."""
     with get_connection(temp_db) as conn:
-        count = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
-    assert count >= 10
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    with get_connection(temp_db, readonly=True) as conn:
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            conn.execute("DELETE FROM sales")
 
 
-def test_customers_seeded(temp_db):
-    """Stammdaten: mind. 10 Kunden vorhanden."""
+def test_sales_summary_uses_month_index(temp_db):
+    """Die Monatsauswertung läuft über den Index auf der abgeleiteten Monatsspalte."""
     with get_connection(temp_db) as conn:
-        count = conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
-    assert count >= 10
+        plan = " ".join(r[3] for r in conn.execute(f"EXPLAIN QUERY PLAN {SALES_SUMMARY_SQL}"))
+        months = conn.execute("SELECT DISTINCT sale_year_month FROM sales").fetchall()
+    assert "USING INDEX idx_sales_year_month" in plan
+    assert all(len(m[0]) == 7 and m[0][4] == "-" for m in months)
+
+
+def test_init_db_adds_month_column(tmp_path):
+    """Eine Datenbank mit altem Schema erhält die Monatsspalte beim init_db."""
+    db = tmp_path / "legacy.db"
+    conn = sqlite3.connect(db)
+    conn.execute(
+        "CREATE TABLE sales (id INTEGER PRIMARY KEY, sale_date TEXT NOT NULL, "
+        "product_id INTEGER, customer_id INTEGER, quantity INTEGER NOT NULL, "
+        "discount REAL DEFAULT 0.0, revenue REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO sales VALUES (1, '2024-03-15', 1, 1, 1, 0.0, 9.5)")
+    conn.commit()
+    conn.close()
+
+    init_db(db)
+    with get_connection(db) as conn:
+        assert conn.execute("SELECT sale_year_month FROM sales").fetchone()[0] == "2024-03"
+
+
+def test_products_seeded(stats):
+    """Stammdaten: mind. 10 Produkte vorhanden."""
+    assert stats["products"] >= 10
+
+
+def test_customers_seeded(stats):
+    """Stammdaten: mind. 10 Kunden vorhanden."""
+    assert stats["customers"] >= 10
 
 
 # ---------------------------------------------------------------------------
 # Datengenerator
 # ---------------------------------------------------------------------------
 
-def test_sales_count(temp_db):
+def test_sales_count(stats):
     """200 Verkäufe generiert."""
-    with get_connection(temp_db) as conn:
-        count = conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
-    assert count == 200
+    assert stats["sales"] == 200
 
 
-def test_revenue_positive(temp_db):
+def test_revenue_positive(stats):
     """Alle Umsatzwerte müssen positiv sein."""
-    with get_connection(temp_db) as conn:
-        min_rev = conn.execute("SELECT MIN(revenue) FROM sales").fetchone()[0]
-    assert min_rev > 0
+    assert stats["min_revenue"] > 0
 
 
-def test_discount_range(temp_db):
+def test_discount_range(stats):
     """Rabatte müssen zwischen 0 und 1 liegen."""
-    with get_connection(temp_db) as conn:
-        row = conn.execute("SELECT MIN(discount), MAX(discount) FROM sales").fetchone()
-    assert row[0] >= 0.0
-    assert row[1] <= 1.0
+    assert stats["min_discount"] >= 0.0
+    assert stats["max_discount"] <= 1.0
 
 
 def test_dates_valid(temp_db):
@@ -108,6 +163,34 @@ def test_reproducibility(temp_db):
     assert abs(rev1 - rev2) < 0.01
 
 
+def test_sales_chunked_insert(tmp_path, monkeypatch):
+    """Blockweises Einfügen: alle Zeilen landen in der DB, auch mit Rest-Block."""
+    import data_seeder
+    monkeypatch.setattr(data_seeder, "SALES_CHUNK_SIZE", 64)
+    db_path = tmp_path / "chunked.db"
+    init_db(db_path)
+    assert generate_sales(n=200, seed=99, db_path=db_path) == 200
+    with get_connection(db_path) as conn:
+        count = conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+    assert count == 200
+
+
+def test_insert_sales_batch(tmp_path):
+    """Batch-Insert übernimmt Dict-Datensätze feldgenau."""
+    db_path = tmp_path / "batch.db"
+    init_db(db_path)
+    seed_master_data(db_path)
+    record = {"sale_date": "2024-06-01", "product_id": 1, "customer_id": 2,
+              "quantity": 3, "discount": 0.1, "revenue": 123.45}
+    assert insert_sales_batch([record], db_path=db_path) == 1
+    with get_connection(db_path) as conn:
+        row = conn.execute(
+            "SELECT sale_date, product_id, customer_id, quantity, discount, revenue "
+            "FROM sales ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+    assert dict(row) == record
+
+
 # ---------------------------------------------------------------------------
 # Abfragen
 # ---------------------------------------------------------------------------
@@ -126,6 +209,30 @@ def test_sales_summary_fields(temp_db):
         assert required.issubset(row.keys())
 
 
+def test_sales_summary_duckdb_matches_sqlite(temp_db):
+    """DuckDB-Engine liefert dieselbe Monatsauswertung wie SQLite."""
+    pytest.importorskip("duckdb")
+    import pandas as pd
+    import database
+    if not database._duckdb_sqlite_ready():
+        pytest.skip("DuckDB-Erweiterung sqlite nicht verfügbar")
+    expected = query_sales_summary(temp_db, as_frame=True)
+    result = query_sales_summary(temp_db, as_frame=True, engine="duckdb")
+    pd.testing.assert_frame_equal(
+        result.sort_values(["month", "category"]).reset_index(drop=True),
+        expected.sort_values(["month", "category"]).reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_sales_summary_duckdb_fallback(temp_db, monkeypatch):
+    """Ohne installiertes duckdb fällt die Abfrage auf SQLite zurück."""
+    monkeypatch.setitem(sys.modules, "duckdb", None)
+    assert query_sales_summary(temp_db, engine="duckdb") == query_sales_summary(temp_db)
+    with pytest.raises(ValueError, match="Engine"):
+        query_sales_summary(temp_db, engine="postgres")
+
+
 def test_top_products_limit(temp_db):
     """Top-Produkte-Abfrage respektiert das Limit."""
     result = query_top_products(limit=5, db_path=temp_db)
@@ -142,6 +249,52 @@ def test_regional_performance_fields(temp_db):
         assert row["total_revenue"] > 0
 
 
+def test_query_as_frame(temp_db):
+    """as_frame=True liefert dieselben Zeilen wie die Dict-Variante."""
+    frame = query_regional_performance(temp_db, as_frame=True)
+    assert frame.to_dict("records") == query_regional_performance(temp_db)
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def test_export_csv_matches_summary(temp_db, tmp_path, monkeypatch):
+    """CSV-Export: Semikolon-getrennt, mit BOM, eine Zeile je Monat und Kategorie."""
+    import exporter
+    monkeypatch.setattr(exporter, "EXPORT_DIR", tmp_path)
+    text = exporter.export_csv(temp_db).read_text(encoding="utf-8")
+    lines = text.splitlines()
+    assert text.startswith("\ufeffmonth;category;total_revenue;total_sales;avg_discount")
+    assert len(lines) - 1 == len(query_sales_summary(temp_db))
+
+
+def test_export_excel_sheets(temp_db, tmp_path, monkeypatch):
+    """Excel-Report enthält alle vier Blätter, Rohdaten mit allen Verkäufen."""
+    import exporter
+    from openpyxl import load_workbook
+    monkeypatch.setattr(exporter, "EXPORT_DIR", tmp_path)
+    wb = load_workbook(exporter.export_excel(temp_db), read_only=True)
+    assert wb.sheetnames == ["Monatsumsatz", "Top Produkte", "Regionale Performance", "Rohdaten"]
+    rows = list(wb["Rohdaten"].iter_rows(values_only=True))
+    assert rows[0][:2] == ("sale_date", "product")
+    assert len(rows) - 1 == 200
+    assert len(list(wb["Top Produkte"].iter_rows())) == 11
+
+
+def test_export_parquet_raw(temp_db, tmp_path, monkeypatch):
+    """Parquet-Export enthält alle Verkäufe in Rohdaten-Spalten, auch über Blockgrenzen."""
+    pytest.importorskip("pyarrow")
+    import exporter
+    import pandas as pd
+    monkeypatch.setattr(exporter, "EXPORT_DIR", tmp_path)
+    monkeypatch.setattr(exporter, "RAW_CHUNK_SIZE", 64)
+    df = pd.read_parquet(exporter.export_parquet(temp_db))
+    assert len(df) == 200
+    assert list(df.columns)[:3] == ["sale_date", "product", "category"]
+    assert df["sale_date"].is_monotonic_increasing
+
+
 # ---------------------------------------------------------------------------
 # Manueller Test-Runner
 # ---------------------------------------------------------------------------
@@ -152,26 +305,32 @@ if __name__ == "__main__":
     init_db(db)
     seed_master_data(db)
     generate_sales(n=200, seed=99, db_path=db)
+    stats = _db_stats(db)
 
     tests = [
         lambda: test_schema_tables_exist(db),
-        lambda: test_products_seeded(db),
-        lambda: test_customers_seeded(db),
-        lambda: test_sales_count(db),
-        lambda: test_revenue_positive(db),
-        lambda: test_discount_range(db),
+        lambda: test_connection_pragmas(db),
+        lambda: test_sales_summary_uses_month_index(db),
+        lambda: test_products_seeded(stats),
+        lambda: test_customers_seeded(stats),
+        lambda: test_sales_count(stats),
+        lambda: test_revenue_positive(stats),
+        lambda: test_discount_range(stats),
         lambda: test_dates_valid(db),
         lambda: test_reproducibility(db),
+        lambda: test_insert_sales_batch(Path(tempfile.mkdtemp())),
         lambda: test_sales_summary_not_empty(db),
         lambda: test_sales_summary_fields(db),
         lambda: test_top_products_limit(db),
         lambda: test_regional_performance_fields(db),
+        lambda: test_query_as_frame(db),
     ]
     names = [
-        "schema_tables_exist", "products_seeded", "customers_seeded",
+        "schema_tables_exist", "connection_pragmas", "sales_summary_uses_month_index",
+        "products_seeded", "customers_seeded",
         "sales_count", "revenue_positive", "discount_range", "dates_valid",
-        "reproducibility", "sales_summary_not_empty", "sales_summary_fields",
-        "top_products_limit", "regional_performance_fields",
+        "reproducibility", "insert_sales_batch", "sales_summary_not_empty", "sales_summary_fields",
+        "top_products_limit", "regional_performance_fields", "query_as_frame",
     ]
     passed = 0
     for t, name in zip(tests, names):